@@ -12,6 +12,41 @@ the beginning of the line.
 #import statement(s)
 from sys import argv
 
+BLOSUM62 = """
+# http://www.ncbi.nlm.nih.gov/Class/FieldGuide/BLOSUM62.txt
+#  Matrix made by matblas from blosum62.iij
+#  * column uses minimum score
+#  BLOSUM Clustered Scoring Matrix in 1/2 Bit Units
+#  Blocks Database = /data/blocks_5.0/blocks.dat
+#  Cluster Percentage: >= 62
+#  Entropy =   0.6979, Expected =  -0.5209
+   A  R  N  D  C  Q  E  G  H  I  L  K  M  F  P  S  T  W  Y  V  B  Z  X  *
+   A  4 -1 -2 -2  0 -1 -1  0 -2 -1 -1 -1 -1 -2 -1  1  0 -3 -2  0 -2 -1  0 -4 
+   R -1  5  0 -2 -3  1  0 -2  0 -3 -2  2 -1 -3 -2 -1 -1 -3 -2 -3 -1  0 -1 -4 
+   N -2  0  6  1 -3  0  0  0  1 -3 -3  0 -2 -3 -2  1  0 -4 -2 -3  3  0 -1 -4 
+   D -2 -2  1  6 -3  0  2 -1 -1 -3 -4 -1 -3 -3 -1  0 -1 -4 -3 -3  4  1 -1 -4 
+   C  0 -3 -3 -3  9 -3 -4 -3 -3 -1 -1 -3 -1 -2 -3 -1 -1 -2 -2 -1 -3 -3 -2 -4 
+   Q -1  1  0  0 -3  5  2 -2  0 -3 -2  1  0 -3 -1  0 -1 -2 -1 -2  0  3 -1 -4 
+   E -1  0  0  2 -4  2  5 -2  0 -3 -3  1 -2 -3 -1  0 -1 -3 -2 -2  1  4 -1 -4 
+   G  0 -2  0 -1 -3 -2 -2  6 -2 -4 -4 -2 -3 -3 -2  0 -2 -2 -3 -3 -1 -2 -1 -4 
+   H -2  0  1 -1 -3  0  0 -2  8 -3 -3 -1 -2 -1 -2 -1 -2 -2  2 -3  0  0 -1 -4 
+   I -1 -3 -3 -3 -1 -3 -3 -4 -3  4  2 -3  1  0 -3 -2 -1 -3 -1  3 -3 -3 -1 -4 
+   L -1 -2 -3 -4 -1 -2 -3 -4 -3  2  4 -2  2  0 -3 -2 -1 -2 -1  1 -4 -3 -1 -4 
+   K -1  2  0 -1 -3  1  1 -2 -1 -3 -2  5 -1 -3 -1  0 -1 -3 -2 -2  0  1 -1 -4 
+   M -1 -1 -2 -3 -1  0 -2 -3 -2  1  2 -1  5  0 -2 -1 -1 -1 -1  1 -3 -1 -1 -4 
+   F -2 -3 -3 -3 -2 -3 -3 -3 -1  0  0 -3  0  6 -4 -2 -2  1  3 -1 -3 -3 -1 -4 
+   P -1 -2 -2 -1 -3 -1 -1 -2 -2 -3 -3 -1 -2 -4  7 -1 -1 -4 -3 -2 -2 -1 -2 -4 
+   S  1 -1  1  0 -1  0  0  0 -1 -2 -2  0 -1 -2 -1  4  1 -3 -2 -2  0  0  0 -4 
+   T  0 -1  0 -1 -1 -1 -1 -2 -2 -1 -1 -1 -1 -2 -1  1  5 -2 -2  0 -1 -1  0 -4 
+   W -3 -3 -4 -4 -2 -2 -3 -2 -2 -3 -2 -3 -1  1 -4 -3 -2 11  2 -3 -4 -3 -2 -4 
+   Y -2 -2 -2 -3 -2 -1 -2 -3  2 -1 -1 -2 -1  3 -3 -2 -2  2  7 -1 -3 -2 -1 -4 
+   V  0 -3 -3 -3 -1 -2 -2 -3 -3  3  1 -2  1 -1 -2 -2  0 -3 -1  4 -3 -2 -1 -4 
+   B -2 -1  3  4 -3  0  1 -1  0 -3 -4  0 -3 -3 -2  0 -1 -4 -3 -3  4  1 -1 -4 
+   Z -1  0  0  1 -3  3  4 -2  0 -3 -3  1 -1 -3 -1  0 -1 -3 -2 -2  1  4 -1 -4 
+   X  0 -1 -1 -1 -2 -1 -1 -1 -1 -1 -1 -1 -1 -1 -2  0  0 -2 -1 -1 -1 -1 -1 -4 
+   * -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4  1 
+"""
+
 
 def blosum_parser(blosum):
     """Return order and similarity scores from BLOSUM62 matrix
@@ -222,43 +257,98 @@ def calculate_scores(matches, matrix, start):
     return (alg_score,ident_score)
 
 
+def xdrop_row(seq1, seq2, row_idx, prev_row, best, gap_pen, xdrop, order,
+              blosum_matrix):
+    """Fills one row of the X-drop extension matrix.
+
+    :param seq1: str; first sequence (rows).
+    :param seq2: str; second sequence (columns).
+    :param row_idx: int; index of the row that is being filled.
+    :param prev_row: dict; {col_idx: score} of the live cells in the row above.
+    :param best: int; best score seen so far in the extension.
+    :param gap_pen: int; gap penalty.
+    :param xdrop: int; cells scoring more than xdrop below best are dropped.
+    :param order: dict of {res: idx_in_matrix}.
+    :param blosum_matrix: list of lists with similarity scores.
+    :return: tuple of two dicts; {col_idx: score} and {col_idx: direction} of
+                the live cells in this row.
+
+    Only the columns reachable from a live cell in the row above are filled.
+    The row keeps growing to the right with horizontal moves as long as the
+    scores stay within xdrop of the best score.
+    """
+    row = {}
+    directions = {}
+    col_idx = min(prev_row)
+    last_col = min(max(prev_row) + 1, len(seq2))
+    while col_idx <= len(seq2):
+        if col_idx > last_col and col_idx - 1 not in row:
+            break
+        optional_values = {}
+        if col_idx - 1 in prev_row:
+            value = getting_value(order, blosum_matrix,
+                                  [row_idx - 1, col_idx - 1], seq1, seq2)
+            optional_values['dia'] = prev_row[col_idx - 1] + value
+        if col_idx - 1 in row:
+            optional_values['hor'] = row[col_idx - 1] + gap_pen
+        if col_idx in prev_row:
+            optional_values['ver'] = prev_row[col_idx] + gap_pen
+        if optional_values:
+            best_direction = max(optional_values, key=optional_values.get)
+            if optional_values[best_direction] >= best - xdrop:
+                row[col_idx] = optional_values[best_direction]
+                directions[col_idx] = best_direction
+        col_idx += 1
+    return row, directions
+
+
+def xdrop_extension(seq1, seq2, gap_pen, xdrop, order, blosum_matrix):
+    """Extends an alignment from the start of both sequences with X-drop.
+
+    :param seq1: str; first sequence, starting at the seed end (rows).
+    :param seq2: str; second sequence, starting at the seed end (columns).
+    :param gap_pen: int; gap penalty.
+    :param xdrop: int; a cell is dropped when its score is more than xdrop
+                below the best score seen so far.
+    :param order: dict of {res: idx_in_matrix}.
+    :param blosum_matrix: list of lists with similarity scores.
+    :return: tuple; align1 (list), matches (list), align2 (list), the best
+                extension score (int) and the end position of the best
+                extension [row index, column index].
+
+    Unlike fil_matrix only the live cells are filled: the extension stops as
+    soon as a row has no cell within xdrop of the best score. The work done on
+    a dissimilar flank is therefore proportional to the similar region. To
+    extend to the left of a seed, pass both flanks reversed.
+    """
+    best = 0
+    best_pos = [0, 0]
+    prev_row = {0: 0}
+    traceback = [{0: ''}]
+    col_idx = 1
+    while col_idx <= len(seq2) and col_idx * gap_pen >= -xdrop:
+        prev_row[col_idx] = col_idx * gap_pen
+        traceback[0][col_idx] = 'hor'
+        col_idx += 1
+    for row_idx in range(1, len(seq1) + 1):
+        row, directions = xdrop_row(seq1, seq2, row_idx, prev_row, best,
+                                    gap_pen, xdrop, order, blosum_matrix)
+        if not row:
+            break
+        traceback.append(directions)
+        for col_idx, score in row.items():
+            if score > best:
+                best = score
+                best_pos = [row_idx, col_idx]
+        prev_row = row
+    align1, matches, align2 = traceback_matrix(traceback, best_pos.copy(),
+                                               seq1, seq2)
+    return align1, matches, align2, best, best_pos
+
+
 def main(seq1,seq2, end_gap_pen, gap_pen):
     """this is the main finction of the script"""
-    blosum = """
-# http://www.ncbi.nlm.nih.gov/Class/FieldGuide/BLOSUM62.txt
-#  Matrix made by matblas from blosum62.iij
-#  * column uses minimum score
-#  BLOSUM Clustered Scoring Matrix in 1/2 Bit Units
-#  Blocks Database = /data/blocks_5.0/blocks.dat
-#  Cluster Percentage: >= 62
-#  Entropy =   0.6979, Expected =  -0.5209
-   A  R  N  D  C  Q  E  G  H  I  L  K  M  F  P  S  T  W  Y  V  B  Z  X  *
-   A  4 -1 -2 -2  0 -1 -1  0 -2 -1 -1 -1 -1 -2 -1  1  0 -3 -2  0 -2 -1  0 -4 
-   R -1  5  0 -2 -3  1  0 -2  0 -3 -2  2 -1 -3 -2 -1 -1 -3 -2 -3 -1  0 -1 -4 
-   N -2  0  6  1 -3  0  0  0  1 -3 -3  0 -2 -3 -2  1  0 -4 -2 -3  3  0 -1 -4 
-   D -2 -2  1  6 -3  0  2 -1 -1 -3 -4 -1 -3 -3 -1  0 -1 -4 -3 -3  4  1 -1 -4 
-   C  0 -3 -3 -3  9 -3 -4 -3 -3 -1 -1 -3 -1 -2 -3 -1 -1 -2 -2 -1 -3 -3 -2 -4 
-   Q -1  1  0  0 -3  5  2 -2  0 -3 -2  1  0 -3 -1  0 -1 -2 -1 -2  0  3 -1 -4 
-   E -1  0  0  2 -4  2  5 -2  0 -3 -3  1 -2 -3 -1  0 -1 -3 -2 -2  1  4 -1 -4 
-   G  0 -2  0 -1 -3 -2 -2  6 -2 -4 -4 -2 -3 -3 -2  0 -2 -2 -3 -3 -1 -2 -1 -4 
-   H -2  0  1 -1 -3  0  0 -2  8 -3 -3 -1 -2 -1 -2 -1 -2 -2  2 -3  0  0 -1 -4 
-   I -1 -3 -3 -3 -1 -3 -3 -4 -3  4  2 -3  1  0 -3 -2 -1 -3 -1  3 -3 -3 -1 -4 
-   L -1 -2 -3 -4 -1 -2 -3 -4 -3  2  4 -2  2  0 -3 -2 -1 -2 -1  1 -4 -3 -1 -4 
-   K -1  2  0 -1 -3  1  1 -2 -1 -3 -2  5 -1 -3 -1  0 -1 -3 -2 -2  0  1 -1 -4 
-   M -1 -1 -2 -3 -1  0 -2 -3 -2  1  2 -1  5  0 -2 -1 -1 -1 -1  1 -3 -1 -1 -4 
-   F -2 -3 -3 -3 -2 -3 -3 -3 -1  0  0 -3  0  6 -4 -2 -2  1  3 -1 -3 -3 -1 -4 
-   P -1 -2 -2 -1 -3 -1 -1 -2 -2 -3 -3 -1 -2 -4  7 -1 -1 -4 -3 -2 -2 -1 -2 -4 
-   S  1 -1  1  0 -1  0  0  0 -1 -2 -2  0 -1 -2 -1  4  1 -3 -2 -2  0  0  0 -4 
-   T  0 -1  0 -1 -1 -1 -1 -2 -2 -1 -1 -1 -1 -2 -1  1  5 -2 -2  0 -1 -1  0 -4 
-   W -3 -3 -4 -4 -2 -2 -3 -2 -2 -3 -2 -3 -1  1 -4 -3 -2 11  2 -3 -4 -3 -2 -4 
-   Y -2 -2 -2 -3 -2 -1 -2 -3  2 -1 -1 -2 -1  3 -3 -2 -2  2  7 -1 -3 -2 -1 -4 
-   V  0 -3 -3 -3 -1 -2 -2 -3 -3  3  1 -2  1 -1 -2 -2  0 -3 -1  4 -3 -2 -1 -4 
-   B -2 -1  3  4 -3  0  1 -1  0 -3 -4  0 -3 -3 -2  0 -1 -4 -3 -3  4  1 -1 -4 
-   Z -1  0  0  1 -3  3  4 -2  0 -3 -3  1 -1 -3 -1  0 -1 -3 -2 -2  1  4 -1 -4 
-   X  0 -1 -1 -1 -2 -1 -1 -1 -1 -1 -1 -1 -1 -1 -2  0  0 -2 -1 -1 -1 -1 -1 -4 
-   * -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4 -4  1 
-"""
-    order, blosum = blosum_parser(blosum)
+    order, blosum = blosum_parser(BLOSUM62)
     matrix = initial_matrix(seq1,seq2,end_gap_pen)
     matrix,start,traceback=fil_matrix(seq1,seq2,matrix,gap_pen,order,blosum)
     traceback=completing_traceback(traceback, seq1, seq2)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to save the profile Hidden Markov Model of
+Hidden_Markov_Model.py (norm_trans, norm_matches) in a binary file and to
+load it again without building it from the alignment.
+
+Usage: python [script.py] [aligned fasta file] [model file]
+
+The file starts with a header (magic, version, number of match states, the
+most residues at one match state, alphabet size and a CRC32 checksum of the
+rest of the file). After the header the arrays follow without padding, in the
+order of FIELDS:
+    trans       float64, 9 x (n + 1) transition probabilities (NAMES order)
+    probs       float64, n x width emission probabilities
+    background  float64, background probabilities (pa)
+    columns     int64, alignment column of every match state (-1 unknown)
+    codes       uint8, n x width ASCII codes of the emitted residues (0 is
+                an empty slot)
+    alphabet    uint8, ASCII codes of the residues in pa
+Loading maps the file into memory, so processes that load the same file
+share its pages and no parsing is needed.
+"""
+# Import statements
+import struct
+import time
+import zlib
+from sys import argv
+
+import numpy as np
+
+from Hidden_Markov_Model import pa, parse_fasta
+from profile_HMM import (NAMES, build_profile, gap_counts, guide_array,
+                         load_alignment)
+
+MAGIC = b'PHMM'
+VERSION = 1
+HEADER = struct.Struct('<4sIIIII')  # magic, version, n, width, alphabet, crc
+FIELDS = ['trans', 'probs', 'background', 'columns', 'codes', 'alphabet']
+
+
+def field_layout(length, width, alphabet):
+    """Gives the type and shape of every array in the file.
+
+    :param length: int; number of match states n.
+    :param width: int; the most residues at one match state.
+    :param alphabet: int; number of residues in the background.
+    :return: dictionary; the key is the field name; the value is a tuple of
+                the numpy type and the shape.
+    """
+    return {'trans': (np.float64, (len(NAMES), length + 1)),
+            'probs': (np.float64, (length, width)),
+            'background': (np.float64, (alphabet,)),
+            'columns': (np.int64, (length,)),
+            'codes': (np.uint8, (length, width)),
+            'alphabet': (np.uint8, (alphabet,))}
+
+
+def save_model(name, norm_trans, norm_matches, columns=None, background=pa):
+    """Writes the model to a binary file.
+
+    :param name: str; name of the model file.
+    :param norm_trans: dictionary; the keys are the transition types. The
+                    values is a list of probabilities per position in a
+                    sequence
+    :param norm_matches: dictionary; the key is match state position in a
+                    sequence; the value is a list of lists with a sublist
+                    containing the probability of occurrence of the protein.
+    :param columns: list; alignment column of every match state, None when
+                    not known.
+    :param background: dictionary; background probability of every residue.
+    :return: None
+    """
+    length = len(norm_trans['MM']) - 1
+    options = [norm_matches.get(pos, []) for pos in range(length)]
+    width = max([len(option) for option in options] + [1])
+    arrays = {'trans': [norm_trans[key] for key in NAMES],
+              'probs': np.zeros((length, width)),
+              'background': list(background.values()),
+              'columns': [-1] * length if columns is None else columns,
+              'codes': np.zeros((length, width)),
+              'alphabet': [ord(res) for res in background]}
+    for pos, option in enumerate(options):
+        arrays['codes'][pos, :len(option)] = [ord(res) for res, p in option]
+        arrays['probs'][pos, :len(option)] = [p for res, p in option]
+    layout = field_layout(length, width, len(background))
+    payload = b''.join(np.asarray(arrays[key], dtype=layout[key][0]).tobytes()
+                       for key in FIELDS)
+    with open(name, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, length, width, len(background),
+                               zlib.crc32(payload)))
+        file.write(payload)
+
+
+def load_model(name, verify=True):
+    """Maps a model file into memory.
+
+    :param name: str; name of the model file.
+    :param verify: bool; check the checksum of the file.
+    :return: dictionary; the read-only arrays of FIELDS and 'length', the
+                number of match states.
+    """
+    raw = np.memmap(name, dtype=np.uint8, mode='r')
+    if len(raw) < HEADER.size:
+        raise ValueError("{} is not a model file".format(name))
+    magic, version, length, width, alphabet, crc = HEADER.unpack(
+        raw[:HEADER.size].tobytes())
+    if magic != MAGIC:
+        raise ValueError("{} is not a model file".format(name))
+    if version != VERSION:
+        raise ValueError("unsupported model file version {}".format(version))
+    layout = field_layout(length, width, alphabet)
+    size = HEADER.size + sum(np.dtype(kind).itemsize * int(np.prod(shape))
+                             for kind, shape in layout.values())
+    if len(raw) != size:
+        raise ValueError("{} is truncated or too long".format(name))
+    if verify and zlib.crc32(raw[HEADER.size:]) != crc:
+        raise ValueError("checksum of {} does not match".format(name))
+    model = {'length': length}
+    offset = HEADER.size
+    for key in FIELDS:
+        kind, shape = layout[key]
+        nbytes = np.dtype(kind).itemsize * int(np.prod(shape))
+        model[key] = raw[offset:offset + nbytes].view(kind).reshape(shape)
+        offset += nbytes
+    return model
+
+
+def model_dictionaries(model):
+    """Turns a loaded model back into the dictionaries of the scripts.
+
+    :param model: dictionary; the arrays made by load_model.
+    :return: tuple of two dictionaries; norm_trans and norm_matches.
+    """
+    norm_trans = {key: model['trans'][idx].tolist()
+                  for idx, key in enumerate(NAMES)}
+    norm_matches = {}
+    for pos in range(model['length']):
+        codes = model['codes'][pos].tolist()
+        probs = model['probs'][pos].tolist()
+        option = [[chr(code), prob] for code, prob in zip(codes, probs)
+                  if code]
+        if option:  # save_model stores a missing position as empty
+            norm_matches[pos] = option
+    return norm_trans, norm_matches
+
+
+def stored_background(model):
+    """Gives the background probabilities stored in a loaded model.
+
+    :param model: dictionary; the arrays made by load_model.
+    :return: dictionary; background probability of every residue, like pa.
+    """
+    return {chr(code): prob for code, prob in
+            zip(model['alphabet'].tolist(), model['background'].tolist())}
+
+
+def is_model_file(name):
+    """Tells whether a file is a model file.
+
+    :param name: str; name of the file.
+    :return: bool; True when the file starts with MAGIC.
+    """
+    with open(name, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def read_model(name):
+    """Reads a model file or builds the model from an aligned FASTA file.
+
+    :param name: str; name of a model file or of an aligned fasta file.
+    :return: tuple of two dictionaries; norm_trans and norm_matches.
+    """
+    if is_model_file(name):
+        return model_dictionaries(load_model(name))
+    fasta = parse_fasta(open(name).read().split('>')[1:])  # first is empty
+    return build_profile(load_alignment(list(fasta.values())))
+
+
+def main():
+    """This is the main function of the script"""
+    fasta = parse_fasta(open(argv[1]).read().split('>')[1:])
+    alignment = load_alignment(list(fasta.values()))
+    norm_trans, norm_matches = build_profile(alignment)
+    guide = guide_array(gap_counts(alignment), len(alignment))
+    columns = np.flatnonzero(guide)
+    save_model(argv[2], norm_trans, norm_matches, columns.tolist())
+    print("saved {} match states to {}".format(len(columns), argv[2]))
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to generate many sequences with the profile
+Hidden Markov Model of Hidden_Markov_Model.py and write them to a FASTA file.
+
+Usage: python [script.py] [aligned fasta file or model file (HMM_file.py)]
+       [output fasta file] [number of sequences] [seed (optional)]
+       [processes (optional)]
+
+The sequences are generated in batches of a fixed size. Every batch gets its
+own random number stream, spawned from the seed, and the batches are written
+in order. Which process generates a batch does not matter, so the same seed
+gives the same file for any number of processes. A model file is not sent
+to the processes: each maps the file and makes its own tables.
+"""
+# Import statements
+import time
+from multiprocessing import Pool
+from sys import argv
+
+import numpy as np
+
+from HMM_file import (is_model_file, load_model, model_dictionaries,
+                      read_model, stored_background)
+from profile_HMM import compile_sampler, sample_batch
+
+SAMPLER = {}  # the sampling tables of a worker process, set by init_worker
+
+
+def compile_sampler_file(name):
+    """Makes the sampling tables from a memory-mapped model file.
+
+    :param name: str; name of the model file (HMM_file.py).
+    :return: dictionary; the tables made by compile_sampler, with the
+                background stored in the file for the insert states.
+    """
+    model = load_model(name)
+    norm_trans, norm_matches = model_dictionaries(model)
+    return compile_sampler(norm_trans, norm_matches, stored_background(model))
+
+
+def init_worker(sampler):
+    """Stores the sampling tables in the worker process.
+
+    :param sampler: str or dictionary; the name of a model file, which every
+                process maps and compiles itself, or the tables made by
+                compile_sampler.
+    :return: None
+    """
+    if isinstance(sampler, str):
+        sampler = compile_sampler_file(sampler)
+    SAMPLER.update(sampler)
+
+
+def generate_batch(args):
+    """Generates one batch of sequences (used by the process pool).
+
+    :param args: tuple; number of sequences and the SeedSequence of the
+                batch.
+    :return: list; the generated sequences.
+    """
+    num, seed_seq = args
+    return sample_batch(SAMPLER, num, np.random.default_rng(seed_seq))
+
+
+def batch_jobs(num, seed, batch_size):
+    """Divides the sequences into batches with their own random stream.
+
+    :param num: int; number of sequences to generate.
+    :param seed: int; seed of the random numbers, None gives a random seed.
+    :param batch_size: int; number of sequences per batch.
+    :return: list of tuples; number of sequences and SeedSequence per batch.
+    """
+    sizes = [min(batch_size, num - start) for start in
+             range(0, num, batch_size)]
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    return list(zip(sizes, streams))
+
+
+def generate_fasta(norm_trans, norm_matches, num, name, seed=None,
+                   processes=None, batch_size=10000):
+    """Generates sequences with the HMM and writes them as a FASTA file.
+
+    :param norm_trans: dictionary; the keys are the transition types. The
+                    values is a list of probabilities per position in a
+                    sequence
+    :param norm_matches: dictionary; the key is match state position in a
+                    sequence; the value is a list of lists with a sublist
+                    containing the probability of occurrence of the protein.
+    :param num: int; number of sequences to generate.
+    :param name: str; name of the output file.
+    :param seed: int; seed of the random numbers, None gives a random seed.
+    :param processes: int; number of processes, None uses all cores.
+    :param batch_size: int; number of sequences per batch.
+    :return: None
+    """
+    write_samples(compile_sampler(norm_trans, norm_matches), num, name, seed,
+                  processes, batch_size)
+
+
+def write_samples(sampler, num, name, seed=None, processes=None,
+                  batch_size=10000):
+    """Generates sequences in a process pool and writes them as FASTA.
+
+    :param sampler: str or dictionary; the name of a model file (every
+                    process maps it itself) or the tables made by
+                    compile_sampler.
+    :param num: int; number of sequences to generate.
+    :param name: str; name of the output file.
+    :param seed: int; seed of the random numbers, None gives a random seed.
+    :param processes: int; number of processes, None uses all cores.
+    :param batch_size: int; number of sequences per batch. The output only
+                    depends on the seed and the batch size.
+    :return: None
+
+    The batches are written as soon as they are done (in order), so the
+    memory use does not grow with the number of sequences.
+    """
+    seq_id = 0
+    with Pool(processes, initializer=init_worker,
+              initargs=(sampler,)) as pool, open(name, 'w') as file:
+        for seqs in pool.imap(generate_batch,
+                              batch_jobs(num, seed, batch_size)):
+            for seq in seqs:
+                seq_id += 1
+                file.write('>sample_' + str(seq_id) + '\n')
+                file.write(seq + '\n')
+
+
+def main():
+    """This is the main function of the script"""
+    seed = int(argv[4]) if len(argv) > 4 else None
+    processes = int(argv[5]) if len(argv) > 5 else None
+    if is_model_file(argv[1]):
+        write_samples(argv[1], int(argv[3]), argv[2], seed, processes)
+    else:
+        norm_trans, norm_matches = read_model(argv[1])
+        generate_fasta(norm_trans, norm_matches, int(argv[3]), argv[2], seed,
+                       processes)
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
@@ -0,0 +1,623 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to score protein sequences against the profile
+Hidden Markov Model of Hidden_Markov_Model.py (norm_trans, norm_matches).
+
+Usage: python [script.py] [aligned fasta file or model file (HMM_file.py)]
+       [fasta file]
+
+The model has a begin state (match state 0), match and delete states 1 to n,
+insert states 0 to n and an end state. norm_trans[XY][p] is the transition
+from state X at position p to Y at position p + 1 (or to the insert state at
+p). Both the Viterbi and the forward algorithm are vectorized over the match
+states; the scores are log-odds (natural log) against the background
+probabilities pa, or those stored in a model file.
+
+Every row needs the row of the previous residue, so the residues are a
+Python loop. viterbi_scores and forward_scores share that loop between a
+batch of sequences of about the same length: every step fills the rows of
+the whole batch. The chain of delete states within a row is one accumulate
+(Viterbi, log space) or one cumulative sum (forward, in probability space
+with every row scaled to its largest value). Measured on one core, a batch
+of 400-residue sequences against a 300-state model costs about 3 to 4 ms
+per sequence for either algorithm; viterbi gives the path of one sequence.
+"""
+# Import statements
+import math
+import time
+from sys import argv
+
+import numpy as np
+
+from HMM_file import (is_model_file, load_model, read_model,
+                      stored_background)
+from Hidden_Markov_Model import pa, parse_fasta
+from profile_HMM import NAMES
+
+ALPHABET = ''.join(pa.keys())
+STATES = 'MID'
+
+
+def compile_model(norm_trans, norm_matches, pseudocount=0.01,
+                  background=pa):
+    """Turns the dictionaries of the model into log space arrays.
+
+    :param norm_trans: dictionary; the keys are the transition types. The
+                    values is a list of probabilities per position in a
+                    sequence
+    :param norm_matches: dictionary; the key is match state position in a
+                    sequence; the value is a list of lists with a sublist
+                    containing the probability of occurrence of the protein.
+    :param pseudocount: float; added to every transition probability and
+                    (times the background) to every emission probability
+                    before normalising, so unseen events are not impossible.
+    :param background: dictionary; background probability of every residue.
+    :return: dictionary; 'trans': 9 x (n + 1) log transition probabilities
+                in the order of NAMES, 'match': n x 21 log-odds emission
+                scores (the last column for residues that are not in pa) and
+                'length': the number of match states n.
+    """
+    length = len(norm_trans['MM']) - 1
+    trans = np.array([norm_trans[name] for name in NAMES], dtype=np.float64)
+    emis = np.zeros((length, len(ALPHABET)))
+    for pos in range(length):
+        for res, prob in norm_matches.get(pos, []):
+            if res in pa:
+                emis[pos, ALPHABET.index(res)] = prob
+    return compile_arrays(trans, emis, background, pseudocount)
+
+
+def compile_arrays(trans, emis, background=pa, pseudocount=0.01):
+    """Turns the probability arrays of the model into log space arrays.
+
+    :param trans: numpy array; 9 x (n + 1) transition probabilities in the
+                    order of NAMES.
+    :param emis: numpy array; n x 20 emission probabilities in the order of
+                    ALPHABET.
+    :param background: dictionary; background probability of every residue.
+    :param pseudocount: float; see compile_model.
+    :return: dictionary; the arrays of compile_model.
+    """
+    length = len(emis)
+    trans = np.asarray(trans, dtype=np.float64).reshape(3, 3, length + 1) + \
+        pseudocount
+    with np.errstate(divide='ignore'):
+        trans = np.log(trans / trans.sum(axis=1, keepdims=True))
+    trans[2, :, 0] = -np.inf  # there is no delete state at position 0
+    background = np.array([background[res] for res in ALPHABET])
+    emis = emis + pseudocount * background
+    emis /= emis.sum(axis=1, keepdims=True)
+    match = np.zeros((length, len(ALPHABET) + 1))
+    with np.errstate(divide='ignore'):
+        match[:, :-1] = np.log(emis / background)
+    return {'trans': trans.reshape(9, length + 1), 'match': match,
+            'length': length}
+
+
+def compile_model_file(name, pseudocount=0.01):
+    """Compiles a model file straight from its memory-mapped arrays.
+
+    :param name: str; name of the model file (HMM_file.py).
+    :param pseudocount: float; see compile_model.
+    :return: dictionary; the arrays of compile_model, with the background
+                stored in the file.
+    """
+    model = load_model(name)
+    table = np.full(256, len(ALPHABET), dtype=np.int64)
+    for idx, res in enumerate(ALPHABET):
+        table[ord(res)] = idx
+    column = table[model['codes']]
+    keep = (model['codes'] > 0) & (column < len(ALPHABET))
+    emis = np.zeros((model['length'], len(ALPHABET) + 1))
+    rows = np.broadcast_to(np.arange(model['length'])[:, None], keep.shape)
+    emis[rows[keep], column[keep]] = model['probs'][keep]
+    return compile_arrays(model['trans'], emis[:, :-1],
+                          stored_background(model), pseudocount)
+
+
+def encode_sequence(seq):
+    """Translates a protein sequence to the emission column indices.
+
+    :param seq: str; protein sequence.
+    :return: numpy array; index in ALPHABET per residue, residues that are
+                not in pa get index len(ALPHABET).
+    """
+    table = np.full(256, len(ALPHABET), dtype=np.int64)
+    for idx, res in enumerate(ALPHABET):
+        table[ord(res)] = idx
+        table[ord(res.lower())] = idx
+    return table[np.frombuffer(seq.encode(), dtype=np.uint8)]
+
+
+def encode_batch(seqs):
+    """Translates a batch of sequences into one padded array.
+
+    :param seqs: list; protein sequences.
+    :return: numpy array, numpy array; sequences x longest sequence emission
+                column indices (padded with the unknown residue) and the
+                length of every sequence.
+    """
+    lengths = np.array([len(seq) for seq in seqs], dtype=np.int64)
+    codes = np.full((len(seqs), max(lengths.max(initial=0), 1)),
+                    len(ALPHABET), dtype=np.int64)
+    for idx, seq in enumerate(seqs):
+        codes[idx, :len(seq)] = encode_sequence(seq)
+    return codes, lengths
+
+
+def length_batches(seqs, batch_size):
+    """Divides sequences into batches of about the same length.
+
+    :param seqs: list; protein sequences.
+    :param batch_size: int; number of sequences per batch.
+    :return: generator; numpy arrays with the indices in seqs of a batch.
+    """
+    order = np.argsort([len(seq) for seq in seqs], kind='stable')
+    for start in range(0, len(order), batch_size):
+        yield order[start:start + batch_size]
+
+
+def scan(start, step, combine):
+    """Solves d[j] = combine(start[j], d[j - 1] + step[j]) for all j.
+
+    :param start: numpy array; value when the chain begins at j (last axis,
+                leading dimensions are kept).
+    :param step: numpy array; score to extend the chain to j.
+    :param combine: numpy ufunc; np.maximum (Viterbi) or np.logaddexp
+                (forward).
+    :return: numpy array; d for every j.
+
+    With s the prefix sums of step, d[j] - s[j] is the running combine of
+    start - s, so the chain of delete states within one row is a single
+    accumulate instead of a loop over the match states. A step of minus
+    infinity breaks the chain; the pieces between those are done apart.
+    """
+    result = np.empty(np.shape(start))
+    cuts = [0] + (np.flatnonzero(step[1:] == -np.inf) + 1).tolist() + \
+        [len(step)]
+    for first, last in zip(cuts[:-1], cuts[1:]):
+        sums = np.zeros(last - first)
+        np.cumsum(step[first + 1:last], out=sums[1:])
+        combine.accumulate(start[..., first:last] - sums, axis=-1,
+                           out=result[..., first:last])
+        result[..., first:last] += sums
+    return result
+
+
+def row_arrays(model):
+    """Takes the transition vectors used for every row out of the model.
+
+    :param model: dictionary; the arrays made by compile_model.
+    :return: tuple of numpy arrays; transitions into the match states, into
+                the insert states, from M and I into the delete states and
+                the delete to delete chain (shifted by one position).
+    """
+    trans = model['trans'].reshape(3, 3, -1)
+    step = np.full(model['length'] + 1, -np.inf)
+    step[1:] = trans[2, 2, :-1]
+    return (trans[:, 0, :-1].copy(), trans[:, 1].copy(),
+            trans[:2, 2, :-1].copy(), step)
+
+
+def fill_row(arrays, emission, prev, combine, traceback=False):
+    """Fills the match, insert and delete vectors of one residue.
+
+    :param arrays: tuple of numpy arrays; the vectors made by row_arrays.
+    :param emission: numpy array; match emission scores of the residue for
+                match states 1 to n, None for the row before the sequence.
+    :param prev: numpy array; 3 x (n + 1) scores (M, I, D) of the previous
+                row. Leading dimensions (a batch of sequences) are kept.
+    :param combine: numpy ufunc; np.maximum (Viterbi) or np.logaddexp
+                (forward).
+    :param traceback: bool; also return the source of the best transitions.
+    :return: numpy array; 3 x (n + 1) scores of this row and, with
+                traceback, 3 x (n + 1) sources of the best transitions.
+    """
+    into_match, into_insert, into_delete, step = arrays
+    row = np.full_like(prev, -np.inf)
+    source = np.zeros(prev.shape, dtype=np.int8) if traceback else None
+    if emission is None:
+        row[..., 0, 0] = 0  # begin state
+    else:
+        match = prev[..., :-1] + into_match
+        row[..., 0, 1:] = combine.reduce(match, axis=-2) + emission
+        insert = prev + into_insert
+        row[..., 1, :] = combine.reduce(insert, axis=-2)
+        if traceback:
+            source[..., 0, 1:] = match.argmax(axis=-2)
+            source[..., 1, :] = insert.argmax(axis=-2)
+    delete = row[..., :2, :-1] + into_delete
+    start = np.empty(row.shape[:-2] + row.shape[-1:])
+    start[..., 0] = -np.inf
+    start[..., 1:] = combine(delete[..., 0, :], delete[..., 1, :])
+    row[..., 2, :] = scan(start, step, combine)
+    if traceback:
+        options = [delete[..., 0, :], delete[..., 1, :],
+                   row[..., 2, :-1] + step[1:]]
+        source[..., 2, 1:] = np.stack(options, axis=-2).argmax(axis=-2)
+    return row, source
+
+
+def run_model(model, seq, combine, traceback=False):
+    """Runs the Viterbi or forward algorithm over a sequence.
+
+    :param model: dictionary; the arrays made by compile_model.
+    :param seq: str; protein sequence.
+    :param combine: numpy ufunc; np.maximum (Viterbi) or np.logaddexp
+                (forward).
+    :param traceback: bool; also keep the sources of every row.
+    :return: float, numpy array, numpy array; the log-odds score, the scores
+                of the transitions into the end state and, with traceback,
+                the sources of every row.
+    """
+    arrays = row_arrays(model)
+    emission = model['match'].T[encode_sequence(seq)]
+    row, source = fill_row(arrays, None,
+                           np.full((3, model['length'] + 1), -np.inf),
+                           combine, traceback)
+    sources = [source]
+    for residue in emission:
+        row, source = fill_row(arrays, residue, row, combine, traceback)
+        sources.append(source)
+    into_end = row[:, -1] + model['trans'].reshape(3, 3, -1)[:, 0, -1]
+    if traceback:
+        return combine.reduce(into_end), into_end, np.array(sources)
+    return combine.reduce(into_end), into_end, None
+
+
+def viterbi(model, seq):
+    """Scores a sequence with the most likely path through the model.
+
+    :param model: dictionary; the arrays made by compile_model.
+    :param seq: str; protein sequence.
+    :return: float, list; the log-odds score of the best path and the path
+                as a list of states ('M1', 'I1', 'D2', ...) without the
+                begin and end state.
+    """
+    score, into_end, sources = run_model(model, seq, np.maximum, True)
+    path = []
+    if score == -np.inf:
+        return score, path
+    state = int(into_end.argmax())
+    row, pos = len(seq), model['length']
+    while not (state == 0 and pos == 0):
+        path.append(STATES[state] + str(pos))
+        prev = sources[row, state, pos]
+        if state == 0:
+            row, pos = row - 1, pos - 1
+        elif state == 1:
+            row -= 1
+        else:
+            pos -= 1
+        state = int(prev)
+    return score, path[::-1]
+
+
+def forward(model, seq):
+    """Scores a sequence with the sum over all paths through the model.
+
+    :param model: dictionary; the arrays made by compile_model.
+    :param seq: str; protein sequence.
+    :return: float; the log-odds score.
+    """
+    return float(forward_scores(model, [seq])[0])
+
+
+def viterbi_row(arrays, emission, prev, row, work):
+    """Fills the Viterbi vectors of one residue for a batch of sequences.
+
+    :param arrays: tuple of numpy arrays; the vectors made by row_arrays.
+    :param emission: numpy array; sequences x n match emission scores of the
+                residue, None for the row before the sequence.
+    :param prev: numpy array; 3 x sequences x (n + 1) scores (M, I, D) of
+                the previous row.
+    :param row: numpy array; filled with the scores of this row, same shape
+                as prev.
+    :param work: numpy array; sequences x (n + 1) scratch space.
+    :return: None
+
+    Like fill_row with np.maximum but without traceback: the three sources
+    of every state are combined in place, one state at a time.
+    """
+    into_match, into_insert, into_delete, step = arrays
+    if emission is None:
+        row.fill(-np.inf)
+        row[0, :, 0] = 0  # begin state
+    else:
+        match = row[0, :, 1:]
+        np.add(prev[0, :, :-1], into_match[0], out=match)
+        for src in (1, 2):
+            np.add(prev[src, :, :-1], into_match[src], out=work[:, 1:])
+            np.maximum(match, work[:, 1:], out=match)
+        match += emission
+        row[0, :, 0] = -np.inf
+        np.add(prev[0], into_insert[0], out=row[1])
+        for src in (1, 2):
+            np.add(prev[src], into_insert[src], out=work)
+            np.maximum(row[1], work, out=row[1])
+    work[:, 0] = -np.inf
+    np.add(row[0, :, :-1], into_delete[0], out=work[:, 1:])
+    np.add(row[1, :, :-1], into_delete[1], out=row[2, :, 1:])
+    np.maximum(work[:, 1:], row[2, :, 1:], out=work[:, 1:])
+    row[2] = scan(work, step, np.maximum)
+
+
+def viterbi_scores(model, seqs, batch_size=128):
+    """Scores many sequences with the most likely path through the model.
+
+    :param model: dictionary; the arrays made by compile_model.
+    :param seqs: list; protein sequences.
+    :param batch_size: int; number of sequences filled at the same time.
+    :return: numpy array; the Viterbi log-odds score of every sequence.
+
+    Sequences of about the same length are padded into a batch and every
+    residue step fills the rows of the whole batch at once, so the Python
+    loop over the residues is shared by all sequences of the batch.
+    """
+    arrays = row_arrays(model)
+    match = np.ascontiguousarray(model['match'].T)
+    into_end = model['trans'].reshape(3, 3, -1)[:, 0, -1]
+    scores = np.full(len(seqs), -np.inf)
+    for batch in length_batches(seqs, batch_size):
+        codes, lengths = encode_batch([seqs[idx] for idx in batch])
+        row = np.empty((3, len(batch), model['length'] + 1))
+        prev = np.empty_like(row)
+        work = np.empty(row.shape[1:])
+        viterbi_row(arrays, None, None, row, work)
+        for pos in range(codes.shape[1] + 1):
+            if pos:
+                prev, row = row, prev
+                viterbi_row(arrays, match[codes[:, pos - 1]], prev, row,
+                            work)
+            done = lengths == pos
+            scores[batch[done]] = (row[:, done, -1].T + into_end).max(axis=1)
+    return scores
+
+
+def chain_blocks(step, limit=600.0):
+    """Divides a chain of delete states into blocks for solve_chain.
+
+    :param step: numpy array; probability to extend the chain to j (step[0]
+                is not used).
+    :param limit: float; largest drop (nats) of the chain within a block.
+    :return: list of tuples; the first and last + 1 position of every block,
+                the probability to extend the chain into the block and the
+                product of the steps from the first position of the block.
+    """
+    blocks = []
+    first = 0
+    logs = [0.0]
+    for pos in range(1, len(step) + 1):
+        if pos < len(step) and step[pos] > 0:
+            logs.append(logs[-1] + math.log(step[pos]))
+            if logs[-1] > -limit:
+                continue
+        growth = np.exp(np.array(logs[:pos - first]))
+        blocks.append((first, pos, float(step[first]) if first else 0.0,
+                       growth))
+        first = pos
+        logs = [0.0]
+    return blocks
+
+
+def solve_chain(start, blocks, out):
+    """Solves d[j] = start[j] + step[j] * d[j - 1] in probability space.
+
+    :param start: numpy array; value when the chain begins at j (last axis,
+                leading dimensions are kept), changed in place.
+    :param blocks: list; the blocks of the chain made by chain_blocks.
+    :param out: numpy array; filled with d, same shape as start.
+    :return: None
+
+    Within a block d[j] = growth[j] * cumsum(start / growth)[j]; the blocks
+    keep growth above exp(-limit), so the division cannot overflow.
+    """
+    for first, last, into, growth in blocks:
+        if into:
+            start[..., first] += into * out[..., first - 1]
+        start[..., first:last] /= growth
+        np.cumsum(start[..., first:last], axis=-1, out=out[..., first:last])
+        out[..., first:last] *= growth
+
+
+def prob_arrays(model):
+    """Takes the model out of log space for the scaled forward algorithm.
+
+    :param model: dictionary; the arrays made by compile_model.
+    :return: dictionary; 'trans': 3 x 3 x (n + 1) transition probabilities
+                (from, to, position), 'odds': 21 x n emission odds of match
+                states 1 to n per residue, 'blocks': the delete chain made
+                by chain_blocks and 'length': n.
+    """
+    trans = np.exp(model['trans'].reshape(3, 3, -1))
+    step = np.zeros(model['length'] + 1)
+    step[1:] = trans[2, 2, :-1]
+    return {'trans': trans,
+            'odds': np.ascontiguousarray(np.exp(model['match'].T)),
+            'blocks': chain_blocks(step), 'length': model['length']}
+
+
+def forward_row(probs, odds, prev):
+    """Fills the scaled forward vectors of one residue for a batch.
+
+    :param probs: dictionary; the arrays made by prob_arrays.
+    :param odds: numpy array; sequences x n emission odds of the residue,
+                None for the row before the sequence.
+    :param prev: numpy array; 3 x sequences x (n + 1) scaled probabilities
+                (M, I, D) of the previous row.
+    :return: numpy array, numpy array; the row divided by its largest value
+                and that value (the scale) per sequence.
+
+    The sum over the three source states is one einsum per target state.
+    """
+    trans = probs['trans']
+    row = np.zeros_like(prev)
+    if odds is None:
+        row[0, :, 0] = 1  # begin state
+    else:
+        np.einsum('sbj,sj->bj', prev[:, :, :-1], trans[:, 0, :-1],
+                  out=row[0, :, 1:])
+        row[0, :, 1:] *= odds
+        np.einsum('sbj,sj->bj', prev, trans[:, 1], out=row[1])
+    start = np.zeros(row.shape[1:])
+    np.einsum('sbj,sj->bj', row[:2, :, :-1], trans[:2, 2, :-1],
+              out=start[:, 1:])
+    solve_chain(start, probs['blocks'], row[2])
+    scale = row.max(axis=(0, 2))
+    scale[scale == 0] = 1
+    row /= scale[:, None]
+    return row, scale
+
+
+def forward_scores(model, seqs, batch_size=128):
+    """Scores many sequences with the sum over all paths through the model.
+
+    :param model: dictionary; the arrays made by compile_model.
+    :param seqs: list; protein sequences.
+    :param batch_size: int; number of sequences filled at the same time.
+    :return: numpy array; the forward log-odds score of every sequence.
+
+    The forward algorithm runs in probability space, batched like
+    viterbi_scores. Every row is divided by its largest value and the logs
+    of these scales are added up, so the sums are multiplications and
+    additions instead of log-sum-exp. Cells more than about 700 nats below
+    the best cell of their row become zero.
+    """
+    probs = prob_arrays(model)
+    into_end = probs['trans'][:, 0, -1]
+    scores = np.full(len(seqs), -np.inf)
+    for batch in length_batches(seqs, batch_size):
+        codes, lengths = encode_batch([seqs[idx] for idx in batch])
+        row = forward_row(
+            probs, None, np.zeros((3, len(batch), model['length'] + 1)))[0]
+        total = np.zeros(len(batch))
+        for pos in range(codes.shape[1] + 1):
+            if pos:
+                row, scale = forward_row(probs, probs['odds'][
+                    codes[:, pos - 1]], row)
+                total += np.log(scale)
+            done = lengths == pos
+            with np.errstate(divide='ignore'):
+                scores[batch[done]] = np.log(into_end @ row[:, done, -1]) + \
+                    total[done]
+    return scores
+
+
+def compile_msv(model, scale=3.0, base=190):
+    """Makes the byte score tables of the ungapped (MSV) prefilter.
+
+    :param model: dictionary; the arrays made by compile_model.
+    :param scale: float; score units per nat.
+    :param base: int; byte value of a score of zero.
+    :return: dictionary; 'costs': 22 x n uint8 emission costs, bias minus
+                the score (the last two rows for unknown residues and
+                padding), 'bias': the highest emission score, the uint8
+                costs of starting a segment ('enter') and of starting the
+                next segment ('loop'), 'scale' and 'base'.
+
+    Only the match emissions are used, the insert and delete transitions are
+    left out. Segments start at any match state with the same cost. Bytes
+    cannot be negative, so like 8-bit SIMD filters every emission score is
+    stored as a cost below the bias.
+    """
+    length = model['length']
+    scores = np.round(model['match'].T * scale)
+    bias = int(np.clip(scores.max(initial=0), 0, 255))
+    costs = np.full((len(ALPHABET) + 2, length), 255, dtype=np.uint8)
+    costs[:-1] = np.clip(bias - scores, 0, 255)  # the last row is padding
+    enter = -round(scale * math.log(2 / (length * (length + 1))))
+    loop = -round(scale * math.log(0.5))
+    return {'costs': costs, 'bias': np.uint8(bias),
+            'enter': np.uint8(min(enter, 255)),
+            'loop': np.uint8(min(loop, 255)), 'scale': scale, 'base': base}
+
+
+def add_saturated(values, other, out=None):
+    """Adds uint8 values, where sums above 255 become 255.
+
+    :param values: numpy array; uint8 values.
+    :param other: numpy array or numpy uint8; the values to add.
+    :param out: numpy array; filled with the sum (may be values), None
+                makes a new array.
+    :return: numpy array; the saturated uint8 sum.
+    """
+    out = np.minimum(values, np.uint8(255) - other, out=out)
+    out += other
+    return out
+
+
+def subtract_saturated(values, other, out=None):
+    """Subtracts uint8 values, where differences below 0 become 0.
+
+    :param values: numpy array; uint8 values.
+    :param other: numpy array or numpy uint8; the values to subtract.
+    :param out: numpy array; filled with the difference (may be values),
+                None makes a new array.
+    :return: numpy array; the saturated uint8 difference.
+    """
+    out = np.maximum(values, other, out=out)
+    out -= other
+    return out
+
+
+def msv_filter(msv, seqs):
+    """Scores a batch of sequences with the ungapped multi-segment filter.
+
+    :param msv: dictionary; the tables made by compile_msv.
+    :param seqs: list; protein sequences.
+    :return: numpy array; the filter score (nats) of every sequence, inf when
+                the byte score saturated.
+
+    The sequences are padded into one byte array and all of them take a
+    residue step at the same time. Like 8-bit SIMD filters every score is a
+    uint8 between 0 and 255 with saturating addition and subtraction, which
+    is enough to tell hits from unrelated sequences. A cell adds the bias
+    before it subtracts the cost, so a score within the bias of 255 counts
+    as saturated.
+    """
+    costs = msv['costs']
+    pad = len(costs) - 1
+    longest = max([len(seq) for seq in seqs] + [0])
+    codes = np.full((len(seqs), longest), pad, dtype=np.int64)
+    for idx, seq in enumerate(seqs):
+        codes[idx, :len(seq)] = encode_sequence(seq)
+    cells = np.zeros((len(seqs), costs.shape[1]), dtype=np.uint8)
+    begin = np.full(len(seqs), msv['base'], dtype=np.uint8)
+    best = np.full(len(seqs), msv['base'], dtype=np.uint8)
+    for residue in codes.T:
+        diagonal = np.empty_like(cells)
+        diagonal[:, 0] = 0
+        diagonal[:, 1:] = cells[:, :-1]
+        np.maximum(diagonal, subtract_saturated(begin, msv['enter'])[:, None],
+                   out=diagonal)
+        add_saturated(diagonal, msv['bias'], out=diagonal)
+        cells = subtract_saturated(diagonal, costs[residue], out=diagonal)
+        np.maximum(best, cells.max(axis=1), out=best)
+        np.maximum(begin, subtract_saturated(best, msv['loop']), out=begin)
+    result = (best.astype(np.float64) - msv['base']) / msv['scale']
+    result[best >= 255 - msv['bias']] = np.inf
+    return result
+
+
+def main():
+    """This is the main function of the script"""
+    if is_model_file(argv[1]):
+        model = compile_model_file(argv[1])
+    else:
+        model = compile_model(*read_model(argv[1]))
+    targets = parse_fasta(open(argv[2]).read().split('>')[1:])
+    seqs = list(targets.values())
+    scores = zip(targets, viterbi_scores(model, seqs).tolist(),
+                 forward_scores(model, seqs).tolist())
+    print("name\tviterbi\tforward")
+    for name, score, total in scores:
+        print("{}\t{:.2f}\t{:.2f}".format(name, score, total))
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to search a large protein FASTA file (for
+example a whole proteome) with the profile Hidden Markov Model built from an
+alignment.
+
+Usage: python [script.py] [aligned fasta file or model file (HMM_file.py)]
+       [target fasta file] [number of hits (optional, default 50)]
+       [processes (optional)]
+
+The target file is read in chunks which are scored by a pool of processes.
+Every process gets the model once when it starts. Only a fixed number of
+chunks is waiting at any time and only the best hits are kept in a heap, so
+the memory use does not grow with the size of the target file. A model file
+is not sent to the processes: each maps the file and compiles it, so they
+share the pages of the file.
+
+Before the full forward scoring every chunk goes through the ungapped
+multi-segment (MSV) filter of HMM_scoring.py. Only the sequences scoring at
+least the filter threshold are scored in full; the pass rate is reported.
+
+The E-value is the number of target sequences times exp(-score): for a
+log-odds score against the background this is an upper bound of the number
+of unrelated sequences expected to score as high.
+"""
+# Import statements
+import heapq
+import math
+import time
+from collections import deque
+from multiprocessing import Pool, cpu_count
+from sys import argv
+
+from HMM_file import is_model_file, read_model
+from HMM_scoring import (compile_model, compile_model_file, compile_msv,
+                         forward_scores, msv_filter)
+from fasta_reader import read_fasta_chunks
+
+MODEL = {}  # the model of a worker process, set by init_worker
+MSV = {}  # the filter tables of a worker process, set by init_worker
+
+
+def init_worker(model):
+    """Stores the model in the worker process (used by the process pool).
+
+    :param model: str or dictionary; the name of a model file, which every
+                process maps and compiles itself (the file pages are
+                shared), or the arrays made by compile_model.
+    :return: None
+    """
+    if isinstance(model, str):
+        model = compile_model_file(model)
+    MODEL.update(model)
+    MSV.update(compile_msv(model))
+
+
+def score_chunk(chunk, min_score, msv_threshold):
+    """Scores a chunk of target sequences against the model.
+
+    :param chunk: list of tuples; (header, sequence) of the targets.
+    :param min_score: float; hits scoring lower are not returned.
+    :param msv_threshold: float; minimal filter score (nats) for the full
+                scoring, None scores every sequence in full.
+    :return: tuple; the number of sequences, the number that passed the
+                filter and a list of (score, header) tuples of the hits.
+    """
+    if msv_threshold is not None:
+        passed = msv_filter(MSV, [seq for header, seq in chunk]) >= \
+            msv_threshold
+        chunk = [target for target, keep in zip(chunk, passed) if keep]
+        num_seqs = len(passed)
+    else:
+        num_seqs = len(chunk)
+    scores = forward_scores(MODEL, [seq for header, seq in chunk])
+    hits = [(score, header) for (header, seq), score in
+            zip(chunk, scores.tolist()) if score >= min_score]
+    return num_seqs, len(chunk), hits
+
+
+def keep_best(heap, hits, num_hits, counter):
+    """Adds hits to a heap that keeps only the best num_hits.
+
+    :param heap: list; heap of (score, number, header) tuples.
+    :param hits: list of tuples; (score, header) of new hits.
+    :param num_hits: int; number of hits to keep, at least 1.
+    :param counter: int; number of hits added before (keeps ties in order).
+    :return: int; the updated counter.
+    """
+    if num_hits < 1:
+        raise ValueError("num_hits must be at least 1")
+    for score, header in hits:
+        item = (score, -counter, header)
+        counter += 1
+        if len(heap) < num_hits:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+    return counter
+
+
+def search(model, target, num_hits=50, max_evalue=None, processes=None,
+           chunk_size=200, msv_threshold=6.0):
+    """Searches a target FASTA file with the model.
+
+    :param model: str or dictionary; the name of a model file (HMM_file.py)
+                or the arrays made by compile_model.
+    :param target: str; name of the target FASTA file.
+    :param num_hits: int; maximum number of hits reported, at least 1.
+    :param max_evalue: float; hits with a higher E-value are left out, None
+                keeps all of the best num_hits.
+    :param processes: int; number of processes, None uses all cores.
+    :param chunk_size: int; number of sequences per chunk.
+    :param msv_threshold: float; minimal MSV filter score (nats) for the full
+                scoring, None turns the filter off.
+    :return: tuple; the number of target sequences, the number that passed
+                the filter and a list of (header, score, E-value) tuples of
+                the hits, best first.
+    """
+    if num_hits < 1:
+        raise ValueError("num_hits must be at least 1")
+    processes = processes or cpu_count()
+    heap = []
+    counter = 0
+    num_targets = 0
+    num_passed = 0
+    pending = deque()
+    with Pool(processes, initializer=init_worker,
+              initargs=(model,)) as pool:
+        for chunk in read_fasta_chunks(target, chunk_size):
+            if len(pending) >= 2 * processes:
+                scored, passed, hits = pending.popleft().get()
+                num_targets += scored
+                num_passed += passed
+                counter = keep_best(heap, hits, num_hits, counter)
+            min_score = heap[0][0] if len(heap) == num_hits else -math.inf
+            pending.append(pool.apply_async(
+                score_chunk, (chunk, min_score, msv_threshold)))
+        while pending:
+            scored, passed, hits = pending.popleft().get()
+            num_targets += scored
+            num_passed += passed
+            counter = keep_best(heap, hits, num_hits, counter)
+    table = []
+    for score, number, header in sorted(heap, reverse=True):
+        evalue = num_targets * math.exp(-score)
+        if max_evalue is None or evalue <= max_evalue:
+            table.append((header, score, evalue))
+    return num_targets, num_passed, table
+
+
+def print_hits(num_targets, num_passed, table):
+    """Prints the ranked hit table.
+
+    :param num_targets: int; number of target sequences.
+    :param num_passed: int; number of sequences that passed the filter.
+    :param table: list of tuples; (header, score, E-value) of the hits.
+    :return: None
+    """
+    print("{} target sequences, {} hits".format(num_targets, len(table)))
+    print("filter pass rate: {:.2%}".format(num_passed / max(num_targets, 1)))
+    print("rank\tscore\tE-value\tname")
+    for rank, (header, score, evalue) in enumerate(table, 1):
+        print("{}\t{:.2f}\t{:.2g}\t{}".format(rank, score, evalue, header))
+
+
+def main():
+    """This is the main function of the script"""
+    model = argv[1]
+    if not is_model_file(model):
+        model = compile_model(*read_model(model))
+    num_hits = int(argv[3]) if len(argv) > 3 else 50
+    processes = int(argv[4]) if len(argv) > 4 else None
+    num_targets, num_passed, table = search(model, argv[2], num_hits,
+                                            processes=processes)
+    print_hits(num_targets, num_passed, table)
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
@@ -84,9 +84,9 @@ def write_reduced_fasta(fasta, name):
             new_pos.append(item)
     new_seqs = [''.join(x) for x in list(zip(*new_pos))]
     with open(name, 'w') as file:
-        for i in range(len(new_seqs)):
-            file.write('>' + list(fasta.keys())[i] + '\n')
-            file.write(new_seqs[i] + '\n')
+        for header, seq in zip(fasta.keys(), new_seqs):
+            file.write('>' + header + '\n')
+            file.write(seq + '\n')
 
 
 def transition_dictionary(seqs, guide):
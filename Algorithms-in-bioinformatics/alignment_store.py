@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to convert a (very large) aligned FASTA file
+once into a column store, and to make the reduced alignment and the profile
+Hidden Markov Model of Hidden_Markov_Model.py from that store.
+
+Usage: python [script.py] [aligned fasta file] [store file]
+       [reduced fasta file] [model file (optional)]
+
+The store file has a header (magic, version, number of sequences, number of
+columns, where the names start and the size and modification time of the
+FASTA file it was made from), then the alignment as a columns x
+sequences uint8 matrix (ASCII codes, one column after the other) and at the
+end the sequence names separated by newlines. The matrix is used as a memory
+map and every step reads it in blocks of columns, so the memory use does not
+grow with the size of the alignment. An existing store is used again only
+while the FASTA file keeps the size and modification time in its header. The
+model is identical to the one of Hidden_Markov_Model.main.
+"""
+# Import statements
+import os
+import struct
+import time
+from sys import argv
+
+import numpy as np
+
+from HMM_file import save_model
+from Hidden_Markov_Model import (normalize_match_states,
+                                 normalize_transition_dic)
+from fasta_reader import read_fasta_chunks
+from profile_HMM import (BLOCK, GAP, NAMES, count_emissions, emission_columns,
+                         gather_match_arrays, guide_array)
+
+MAGIC = b'ALNS'
+VERSION = 2
+# magic, version, sequences, columns, names, source size, source mtime (ns)
+HEADER = struct.Struct('<4sIQQQQQ')
+
+
+def convert_fasta(fasta_name, store_name):
+    """Converts an aligned FASTA file into a column store.
+
+    :param fasta_name: str; name of the aligned fasta file.
+    :param store_name: str; name of the store file.
+    :return: None
+
+    The FASTA file is read twice: once for the names and the size, once to
+    fill the matrix with blocks of sequences.
+    """
+    names = []
+    length = None
+    for chunk in read_fasta_chunks(fasta_name, 1000):
+        for header, seq in chunk:
+            if length is None:
+                length = len(seq)
+            elif len(seq) != length:
+                raise ValueError("the sequences are not aligned (unequal "
+                                 "lengths)")
+            names.append(header)
+    length = length or 0
+    names_offset = HEADER.size + length * len(names)
+    source = os.stat(fasta_name)
+    with open(store_name, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(names), length,
+                               names_offset, source.st_size,
+                               source.st_mtime_ns))
+        file.truncate(names_offset)
+        file.seek(names_offset)
+        file.write('\n'.join(names).encode())
+    if not length or not names:
+        return
+    matrix = np.memmap(store_name, dtype=np.uint8, mode='r+',
+                       offset=HEADER.size, shape=(length, len(names)))
+    start = 0
+    for chunk in read_fasta_chunks(fasta_name, max(1, BLOCK // length)):
+        block = np.frombuffer(''.join(seq for header, seq in chunk).encode(),
+                              dtype=np.uint8).reshape(len(chunk), length)
+        matrix[:, start:start + len(chunk)] = block.T
+        start += len(chunk)
+    matrix.flush()
+
+
+def read_header(file, store_name):
+    """Reads and checks the header of a column store.
+
+    :param file: file object; the store opened in binary mode.
+    :param store_name: str; name of the store file (for the errors).
+    :return: tuple; the fields of HEADER.
+    """
+    data = file.read(HEADER.size)
+    if len(data) < len(MAGIC) + 4 or data[:len(MAGIC)] != MAGIC:
+        raise ValueError("{} is not an alignment store".format(store_name))
+    version = struct.unpack_from('<I', data, len(MAGIC))[0]
+    if version != VERSION:
+        raise ValueError("unsupported store version {}".format(version))
+    if len(data) < HEADER.size:
+        raise ValueError("{} is truncated".format(store_name))
+    return HEADER.unpack(data)
+
+
+def open_store(store_name):
+    """Opens a column store.
+
+    :param store_name: str; name of the store file.
+    :return: dictionary; 'columns': read-only memory map of columns x
+                sequences, 'names': list of the sequence names, 'source':
+                size and modification time (ns) of the FASTA file.
+    """
+    with open(store_name, 'rb') as file:
+        magic, version, num_seqs, num_cols, names_offset, size, mtime = \
+            read_header(file, store_name)
+        file.seek(names_offset)
+        names = file.read().decode().split('\n') if num_seqs else []
+    if num_seqs and num_cols:
+        columns = np.memmap(store_name, dtype=np.uint8, mode='r',
+                            offset=HEADER.size, shape=(num_cols, num_seqs))
+    else:
+        columns = np.zeros((num_cols, num_seqs), dtype=np.uint8)
+    return {'columns': columns, 'names': names, 'source': (size, mtime)}
+
+
+def is_current_store(store_name, fasta_name):
+    """Tells whether a store was made from the FASTA file as it is now.
+
+    :param store_name: str; name of the store file.
+    :param fasta_name: str; name of the aligned fasta file.
+    :return: bool; True when the store exists, has this version and records
+                the current size and modification time of the FASTA file.
+    """
+    if not os.path.exists(store_name):
+        return False
+    try:
+        with open(store_name, 'rb') as file:
+            header = read_header(file, store_name)
+    except ValueError:
+        return False
+    source = os.stat(fasta_name)
+    return header[5:] == (source.st_size, source.st_mtime_ns)
+
+
+def column_blocks(columns):
+    """Walks through the columns of the store in blocks.
+
+    :param columns: numpy array; columns x sequences matrix.
+    :return: generator; tuples of the first column and the block.
+    """
+    step = max(1, BLOCK // max(columns.shape[1], 1))
+    for start in range(0, len(columns), step):
+        yield start, columns[start:start + step]
+
+
+def store_gap_counts(columns):
+    """Counts the gaps in every column of the store.
+
+    :param columns: numpy array; columns x sequences matrix.
+    :return: numpy array; number of gaps per column.
+    """
+    counts = np.zeros(len(columns), dtype=np.int64)
+    for start, block in column_blocks(columns):
+        counts[start:start + len(block)] = (block == GAP).sum(axis=1)
+    return counts
+
+
+def store_transitions(columns, guide):
+    """Counts the transitions from a match state to the next.
+
+    :param columns: numpy array; columns x sequences matrix.
+    :param guide: numpy array; True for the columns that are match states.
+    :return: numpy array; 9 x (number of match states + 1) counts, the rows
+                are the transition types in the order of NAMES.
+
+    Same state codes as count_transitions of profile_HMM.py, but the blocks
+    are columns: the last state of every sequence is carried from one block
+    to the next.
+    """
+    num_match = int(guide.sum())
+    pos = (np.cumsum(guide) - guide).astype(np.int32)
+    counts = np.zeros(9 * (num_match + 1) + 1, dtype=np.int64)
+    carry = np.ones(columns.shape[1], dtype=np.int32)  # begin in M
+    for start, block in column_blocks(columns):
+        part = guide[start:start + len(block), None]
+        residue = block != GAP
+        codes = np.where(part, np.where(residue, 1, 3),
+                         np.where(residue, 2, 0)).astype(np.int32)
+        # (row in the block + 1) * 4 + code of the last state so far
+        rows = np.arange(1, len(block) + 1, dtype=np.int32)[:, None] * 4
+        last = np.vstack([carry, np.where(codes > 0, rows + codes, 0)])
+        last = np.maximum.accumulate(last, axis=0) & 3
+        keys = ((last[:-1] - 1) * 3 + codes - 1) * (num_match + 1) + \
+            pos[start:start + len(block), None]
+        keys[codes == 0] = len(counts) - 1
+        counts += np.bincount(keys.ravel(), minlength=len(counts))
+        carry = last[-1]
+    counts += np.bincount((carry - 1) * 3 * (num_match + 1) + num_match,
+                          minlength=len(counts))
+    return counts[:-1].reshape(9, num_match + 1)
+
+
+def write_reduced_store(store, name):
+    """Makes output file with reduced alignments.
+
+    :param store: dictionary; the store made by open_store.
+    :param name: str; name of the output file.
+    :return: None
+
+    Like write_reduced_fasta the reduced alignment includes only the columns
+    where less than half of the positions are gaps. The sequences are
+    written in blocks: a block of sequences is taken from every kept column.
+    """
+    columns = store['columns']
+    keep = emission_columns(store_gap_counts(columns), columns.shape[1])
+    step = max(1, BLOCK // max(len(keep), 1))
+    with open(name, 'w') as file:
+        for start in range(0, columns.shape[1], step):
+            block = columns[:, start:start + step][keep].T.copy()
+            for header, row in zip(store['names'][start:start + step], block):
+                file.write('>' + header + '\n')
+                file.write(row.tobytes().decode() + '\n')
+
+
+def build_store_profile(store):
+    """Creates the profile HMM from a column store.
+
+    :param store: dictionary; the store made by open_store.
+    :return: tuple; norm_trans and norm_matches as made by
+                Hidden_Markov_Model.main and the alignment column of every
+                match state.
+    """
+    columns = store['columns']
+    num_seqs = columns.shape[1]
+    gaps = store_gap_counts(columns)
+    guide = guide_array(gaps, num_seqs)
+    trans = store_transitions(columns, guide)
+    trans_dic = {name: trans[i].tolist() for i, name in enumerate(NAMES)}
+    norm_trans = normalize_transition_dic(trans_dic)
+    # count_emissions takes blocks of whole columns, which are rows here
+    counts, first = count_emissions(columns.T,
+                                    emission_columns(gaps, num_seqs))
+    norm_matches = normalize_match_states(gather_match_arrays(counts, first))
+    return norm_trans, norm_matches, np.flatnonzero(guide)
+
+
+def main():
+    """This is the main function of the script"""
+    if not is_current_store(argv[2], argv[1]):
+        convert_fasta(argv[1], argv[2])
+    store = open_store(argv[2])
+    write_reduced_store(store, argv[3])
+    norm_trans, norm_matches, match_columns = build_store_profile(store)
+    if len(argv) > 4:
+        save_model(argv[4], norm_trans, norm_matches, match_columns.tolist())
+    print("{} sequences, {} columns, {} match states".format(
+        len(store['names']), len(store['columns']), len(match_columns)))
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
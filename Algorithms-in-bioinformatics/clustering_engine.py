@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to make the hierarchical clustering of
+hierarchical_clustering.py fast enough for large csv files (thousands of
+genes). The data points are a 2-D float array and the distances are stored in
+a condensed array: the one-sided matrix of hierarchical_clustering.py
+flattened row after row, so the distance between point i and point j (j < i)
+is at index i * (i - 1) / 2 + j.
+
+Usage: python [script.py] [csv file] [euclidean or correlation]
+       [linkage, one of METHODS (optional, default average)]
+       [numbers of clusters (optional, default 2,3,5)]
+       [newick output file (optional)]
+
+After a merge the distance from the new cluster to every other cluster k is
+the Lance-Williams update
+    d(k, x + y) = a_x d(k, x) + a_y d(k, y) + b d(x, y) + c |d(k, x) - d(k, y)|
+with the coefficients of lance_williams. Centroid, median and Ward work on
+squared distances. 'separation' is calculate_new_dis_matrix_sep of
+hierarchical_clustering.py and 'average' the real average distance.
+
+For the linkages in REDUCIBLE (a merged cluster is never closer to another
+cluster than both parts were) the nearest-neighbour chain is used: follow
+nearest neighbours from any cluster until two clusters are each other's
+nearest neighbour and merge those. This gives the same tree as always
+merging the closest pair, in O(n^2) time. The other linkages keep the
+nearest neighbour of every cluster up to date and merge the closest pair.
+The complete tree is kept as a linkage array, so any number of clusters is a
+cheap cut of the tree.
+"""
+# import statements
+import time
+from sys import argv
+
+import numpy as np
+
+from expression_csv import load_csv
+
+BLOCK = 2 ** 22  # number of distances calculated at once
+METHODS = ['single', 'complete', 'average', 'weighted', 'centroid', 'median',
+           'ward', 'separation']
+REDUCIBLE = ['single', 'complete', 'average', 'weighted', 'ward']
+SQUARED = ['centroid', 'median', 'ward']
+
+
+def condensed_index(i, j):
+    """Gives the place of the distance between two points in the array.
+
+    :param i: int or numpy array; index of point one.
+    :param j: int or numpy array; index of point two, not equal to i.
+    :return: int or numpy array; index in the condensed array.
+    """
+    high = np.maximum(i, j)
+    return high * (high - 1) // 2 + np.minimum(i, j)
+
+
+def prepare_points(points, metric):
+    """Prepares the points for distance_block.
+
+    :param points: numpy array; points x values.
+    :param metric: str; 'euclidean' or 'correlation'.
+    :return: numpy array, numpy array; the centered (euclidean) or
+                standardized (correlation) values and the squared length of
+                every row (None for correlation).
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if metric == 'euclidean':
+        values = points - points.mean(axis=0)
+        return values, (values ** 2).sum(axis=1)
+    if metric == 'correlation':
+        values = points - points.mean(axis=1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values /= np.sqrt((values ** 2).sum(axis=1, keepdims=True))
+        return values, None
+    raise ValueError("unknown metric {}".format(metric))
+
+
+def distance_block(values, norms, start, end):
+    """Calculates the condensed distances of a block of rows.
+
+    :param values: numpy array; the values made by prepare_points.
+    :param norms: numpy array; the row lengths made by prepare_points.
+    :param start: int; first point of the block (at least 1).
+    :param end: int; one past the last point of the block.
+    :return: numpy array; the part of the condensed array from
+                start * (start - 1) / 2 to end * (end - 1) / 2.
+    """
+    product = values[start:end] @ values[:end - 1].T
+    if norms is not None:
+        product *= -2
+        product += norms[start:end, None]
+        product += norms[:end - 1]
+        np.sqrt(np.maximum(product, 0), out=product)
+    else:
+        product = 1 - product
+    # the part of every row left of the diagonal, row after row
+    lower = np.arange(end - 1) < np.arange(start, end)[:, None]
+    return product[lower]
+
+
+def condensed_distances(points, metric='euclidean', decimals=None,
+                        dtype=np.float64):
+    """Calculates the distances between all pairs of points.
+
+    :param points: numpy array; points x values.
+    :param metric: str; 'euclidean' or 'correlation' (one minus the Pearson
+            correlation, like get_corr_dis).
+    :param decimals: int; round the distances like get_euc_dis (1) and
+            get_corr_dis (5) do, None does not round.
+    :param dtype: numpy type; type of the condensed array.
+    :return: numpy array; condensed distances of len(points) points.
+
+    Both distances come from one matrix product per block of rows. The
+    Euclidean distance uses |a - b|^2 = |a|^2 + |b|^2 - 2 a.b (on centered
+    values, which keeps the rounding errors small) and the correlation is
+    the product of the rows standardized to mean zero and length one. A
+    correlation with a constant row is not defined and gives nan.
+    """
+    values, norms = prepare_points(points, metric)
+    num = len(values)
+    condensed = np.empty(num * (num - 1) // 2, dtype=dtype)
+    step = max(1, BLOCK // max(num, 1))
+    for start in range(1, num, step):
+        end = min(num, start + step)
+        block = distance_block(values, norms, start, end)
+        if decimals is not None:
+            block = np.round(block, decimals)
+        condensed[start * (start - 1) // 2:end * (end - 1) // 2] = block
+    return condensed
+
+
+def one_sided_matrix(condensed, num):
+    """Turns a condensed array into the format of create_dis_matrix.
+
+    :param condensed: numpy array; condensed distances of num points.
+    :param num: int; number of points.
+    :return: list of list one-sided matrix and a list of list of column or row
+    names.
+    """
+    matrix = [condensed[i * (i - 1) // 2:i * (i + 1) // 2].tolist()
+              for i in range(1, num)]
+    col_names = ['g' + str(name) for name in range(1, num + 1)]
+    row_names = ['g' + str(name) for name in range(2, num + 1)]
+    return matrix, [row_names, col_names]
+
+
+def row_index(point, offsets):
+    """Gives the places of the distances from one point to all points.
+
+    :param point: int; index of the point.
+    :param offsets: numpy array; i * (i - 1) / 2 for every point i.
+    :return: numpy array; index in the condensed array per point (0 for the
+                point itself).
+    """
+    index = offsets + point
+    index[:point] = offsets[point] + np.arange(point)
+    index[point] = 0
+    return index
+
+
+def lance_williams(method, size_x, size_y, sizes):
+    """Gives the Lance-Williams coefficients of a merge.
+
+    :param method: str; one of METHODS.
+    :param size_x: int; number of points in cluster x.
+    :param size_y: int; number of points in cluster y.
+    :param sizes: numpy array; number of points in the other clusters.
+    :return: tuple; a_x, a_y, b and c (numbers or arrays per cluster).
+    """
+    total = size_x + size_y
+    if method == 'single':
+        return 0.5, 0.5, 0, -0.5
+    if method == 'complete':
+        return 0.5, 0.5, 0, 0.5
+    if method == 'average':
+        return size_x / total, size_y / total, 0, 0
+    if method == 'weighted':
+        return 0.5, 0.5, 0, 0
+    if method == 'centroid':
+        return size_x / total, size_y / total, -size_x * size_y / total ** 2, 0
+    if method == 'median':
+        return 0.5, 0.5, -0.25, 0
+    if method == 'ward':
+        total = total + sizes
+        return (size_x + sizes) / total, (size_y + sizes) / total, \
+            -sizes / total, 0
+    if method == 'separation':
+        return 0.5, 0.5, -0.5, 0
+    raise ValueError("unknown method {}".format(method))
+
+
+def new_distances(method, dis_x, dis_y, dis_xy, size_x, size_y, sizes):
+    """Calculates the distance from a merged cluster to the other clusters.
+
+    :param method: str; one of METHODS.
+    :param dis_x: numpy array; distances from cluster x to the others
+            (squared for the methods in SQUARED).
+    :param dis_y: numpy array; distances from cluster y to the others.
+    :param dis_xy: float; distance between x and y.
+    :param size_x: int; number of points in x.
+    :param size_y: int; number of points in y.
+    :param sizes: numpy array; number of points in the other clusters.
+    :return: numpy array; distances from the merged cluster to the others.
+    """
+    a_x, a_y, b, c = lance_williams(method, size_x, size_y, sizes)
+    new = a_x * dis_x + a_y * dis_y + b * dis_xy
+    if c:
+        new += c * np.abs(dis_x - dis_y)
+    return new
+
+
+def start_linkage(condensed, num, method, weights=None):
+    """Makes the working arrays of the clustering.
+
+    :param condensed: numpy array; condensed distances of num points.
+    :param num: int; number of points.
+    :param method: str; one of METHODS.
+    :param weights: numpy array; starting size of every point (for example
+            the number of points a micro-cluster stands for), None gives 1.
+    :return: tuple of numpy arrays; copy of the distances (squared for the
+                methods in SQUARED), i * (i - 1) / 2 per point, the cluster
+                sizes and which points still stand for a cluster.
+    """
+    if method not in METHODS:
+        raise ValueError("unknown method {}".format(method))
+    work = np.array(condensed, dtype=np.float64)
+    if method in SQUARED:
+        work **= 2
+    offsets = np.arange(num) * (np.arange(num) - 1) // 2
+    sizes = np.ones(num, dtype=np.int64) if weights is None else \
+        np.array(weights, dtype=np.int64)
+    return work, offsets, sizes, np.ones(num, dtype=bool)
+
+
+def merge_clusters(work, offsets, sizes, active, method, point_x, point_y,
+                   dis_xy):
+    """Merges cluster x into cluster y.
+
+    :param work: numpy array; working copy of the condensed distances.
+    :param offsets: numpy array; i * (i - 1) / 2 per point.
+    :param sizes: numpy array; number of points per cluster.
+    :param active: numpy array; True for the points that stand for a
+            cluster.
+    :param method: str; one of METHODS.
+    :param point_x: int; point of cluster x, stops being a cluster.
+    :param point_y: int; point of cluster y, becomes the merged cluster.
+    :param dis_xy: float; distance between x and y (as stored in work).
+    :return: numpy array; index of the distances of the merged cluster.
+
+    The bookkeeping is constant time, the distances of the merged cluster
+    are one vectorized update of its row.
+    """
+    index_x = row_index(point_x, offsets)
+    index_y = row_index(point_y, offsets)
+    others = active.copy()
+    others[[point_x, point_y]] = False
+    work[index_y[others]] = new_distances(
+        method, work[index_x[others]], work[index_y[others]], dis_xy,
+        sizes[point_x], sizes[point_y], sizes[others])
+    active[point_x] = False
+    sizes[point_y] += sizes[point_x]
+    return index_y
+
+
+def nn_chain(condensed, num, method='average', weights=None):
+    """Clusters the points with the nearest-neighbour chain.
+
+    :param condensed: numpy array; condensed distances of num points.
+    :param num: int; number of points.
+    :param method: str; one of REDUCIBLE.
+    :param weights: numpy array; starting size of every point, None gives 1.
+    :return: numpy array; (num - 1) x 3 merges in the order they were made
+                (point that stands for cluster one, the same for cluster
+                two, distance). A merged cluster is kept under the point of
+                cluster two.
+
+    The distances are updated in a copy of the condensed array; a merged
+    cluster takes the place of one of its parts, so nothing is shifted.
+    """
+    if method not in REDUCIBLE:
+        raise ValueError("the chain does not work for {}".format(method))
+    work, offsets, sizes, active = start_linkage(condensed, num, method,
+                                                 weights)
+    merges = np.empty((max(num - 1, 0), 3))
+    chain = []
+    for step in range(num - 1):
+        if not chain:
+            chain.append(int(active.argmax()))
+        while True:
+            point = chain[-1]
+            dis = work[row_index(point, offsets)]
+            dis[~active] = np.inf
+            dis[point] = np.inf
+            nearest = int(dis.argmin())
+            # on a tie go back in the chain, otherwise it can loop
+            if len(chain) > 1 and dis[chain[-2]] <= dis[nearest]:
+                nearest = chain[-2]
+                break
+            chain.append(nearest)
+        chain = chain[:-2]
+        merge_clusters(work, offsets, sizes, active, method, point, nearest,
+                       dis[nearest])
+        merges[step] = point, nearest, dis[nearest]
+    if method in SQUARED:
+        merges[:, 2] = np.sqrt(merges[:, 2])
+    return merges
+
+
+def nearest_neighbour(work, offsets, active, point):
+    """Finds the closest cluster of one cluster.
+
+    :param work: numpy array; working copy of the condensed distances.
+    :param offsets: numpy array; i * (i - 1) / 2 per point.
+    :param active: numpy array; True for the points that stand for a
+            cluster.
+    :param point: int; point of the cluster.
+    :return: tuple; the point of the closest cluster and the distance.
+    """
+    dis = work[row_index(point, offsets)]
+    dis[~active] = np.inf
+    dis[point] = np.inf
+    nearest = int(dis.argmin())
+    return nearest, dis[nearest]
+
+
+def generic_linkage(condensed, num, method='centroid', weights=None):
+    """Clusters the points by always merging the closest pair.
+
+    :param condensed: numpy array; condensed distances of num points.
+    :param num: int; number of points.
+    :param method: str; one of METHODS.
+    :param weights: numpy array; starting size of every point, None gives 1.
+    :return: numpy array; (num - 1) x 3 merges like nn_chain.
+
+    Every cluster keeps its nearest neighbour. After a merge only the
+    clusters whose nearest neighbour was one of the merged clusters search
+    again, the others only compare with the new distances. This works for
+    every linkage, also when a merge can be closer than an earlier one
+    (centroid, median, separation).
+    """
+    work, offsets, sizes, active = start_linkage(condensed, num, method,
+                                                 weights)
+    if num < 2:
+        return np.empty((0, 3))
+    nearest = np.zeros(num, dtype=np.int64)
+    closest = np.full(num, np.inf)
+    for point in range(num):
+        nearest[point], closest[point] = nearest_neighbour(
+            work, offsets, active, point)
+    merges = np.empty((max(num - 1, 0), 3))
+    for step in range(num - 1):
+        point_x = int(closest.argmin())
+        point_y = int(nearest[point_x])
+        dis_xy = closest[point_x]
+        index_y = merge_clusters(work, offsets, sizes, active, method,
+                                 point_x, point_y, dis_xy)
+        merges[step] = point_x, point_y, dis_xy
+        closest[point_x] = np.inf
+        new = work[index_y]
+        new[~active] = np.inf
+        new[point_y] = np.inf
+        nearest[point_y], closest[point_y] = int(new.argmin()), new.min()
+        search = active & ((nearest == point_x) | (nearest == point_y))
+        search[point_y] = False
+        for point in np.flatnonzero(search).tolist():
+            nearest[point], closest[point] = nearest_neighbour(
+                work, offsets, active, point)
+        closer = new < closest
+        nearest[closer] = point_y
+        closest[closer] = new[closer]
+    if method in SQUARED:
+        merges[:, 2] = np.sqrt(merges[:, 2])
+    return merges
+
+
+def linkage_array(merges, num, sort=True):
+    """Sorts the merges and gives every cluster its own number.
+
+    :param merges: numpy array; merges made by nn_chain or generic_linkage.
+    :param num: int; number of points.
+    :param sort: bool; sort the merges on distance (nn_chain does not make
+            them in that order). The merges of generic_linkage are already
+            in order and can go down, so those are not sorted.
+    :return: numpy array; (num - 1) x 4 linkage array. Row i merges cluster
+                row[0] and row[1] (smallest first) at distance row[2] into
+                cluster num + i with row[3] points. Points are clusters 0 to
+                num - 1.
+    """
+    if sort:
+        order = np.argsort(merges[:, 2], kind='stable')
+    else:
+        order = np.arange(len(merges))
+    parent = list(range(num))
+    cluster = list(range(num))
+    sizes = [1] * num
+    linkage = np.empty((len(merges), 4))
+    for row, (point_x, point_y, dis) in enumerate(merges[order]):
+        roots = []
+        for point in (int(point_x), int(point_y)):
+            while parent[point] != point:
+                parent[point] = parent[parent[point]]
+                point = parent[point]
+            roots.append(point)
+        root_x, root_y = roots
+        id_x, id_y = sorted((cluster[root_x], cluster[root_y]))
+        parent[root_x] = root_y
+        cluster[root_y] = num + row
+        sizes[root_y] += sizes[root_x]
+        linkage[row] = id_x, id_y, dis, sizes[root_y]
+    return linkage
+
+
+def cluster_points(condensed, num, method='average', weights=None):
+    """Makes the complete hierarchical clustering of the points.
+
+    :param condensed: numpy array; condensed distances of num points.
+    :param num: int; number of points.
+    :param method: str; one of METHODS.
+    :param weights: numpy array; starting size of every point, None gives 1.
+            Only the merge distances use them, the sizes in the linkage
+            array count the points of the condensed array.
+    :return: numpy array; the linkage array made by linkage_array.
+    """
+    if method in REDUCIBLE:
+        return linkage_array(nn_chain(condensed, num, method, weights), num)
+    return linkage_array(generic_linkage(condensed, num, method, weights),
+                         num, False)
+
+
+def cut_tree(linkage, num_clusters=None, threshold=None):
+    """Cuts the tree into clusters.
+
+    :param linkage: numpy array; the linkage array made by linkage_array.
+    :param num_clusters: int; number of clusters.
+    :param threshold: float; only merges at this distance or lower are made
+            (used when num_clusters is None). When a merge is closer than
+            an earlier one (centroid, median, separation) the tree is cut
+            below the first merge that is higher than the threshold.
+    :return: numpy array; cluster number of every point. The clusters are
+                numbered in the order of their first point.
+
+    The first merges of the linkage array are walked back from the last
+    one: both clusters of a merge get the root of the new cluster, which is
+    already known, so one pass over the merges labels every cluster (O(n)).
+    """
+    num = len(linkage) + 1
+    if num_clusters is not None:
+        made = num - min(max(num_clusters, 1), num)
+    else:
+        heights = np.maximum.accumulate(linkage[:, 2])
+        made = int(np.searchsorted(heights, threshold, side='right'))
+    root = list(range(2 * num - 1))
+    children = linkage[:made, :2].astype(np.int64).tolist()
+    for new in range(num + made - 1, num - 1, -1):
+        node1, node2 = children[new - num]
+        root[node1] = root[node2] = root[new]
+    roots = np.array(root[:num], dtype=np.int64)
+    points = np.arange(num)
+    first = np.full(2 * num - 1, num, dtype=np.int64)
+    np.minimum.at(first, roots, points)
+    # the clusters are counted at their first point
+    number = np.cumsum(first[roots] == points) - 1
+    return number[first[roots]]
+
+
+def cluster_members(labels, names=None):
+    """Lists the names of the points in every cluster.
+
+    :param labels: numpy array; cluster number of every point.
+    :param names: list; name of every point, None gives 'g1', 'g2', ...
+    :return: list; each item are all genes of one cluster in the format of
+                update_names_list ('name1, name2').
+    """
+    if names is None:
+        names = ['g' + str(name) for name in range(1, len(labels) + 1)]
+    members = [[] for cluster in range(int(labels.max(initial=-1)) + 1)]
+    for name, label in zip(names, labels.tolist()):
+        members[label].append(name)
+    return [', '.join(member) for member in members]
+
+
+def newick(linkage, names=None):
+    """Writes the tree in Newick format.
+
+    :param linkage: numpy array; the linkage array made by linkage_array.
+    :param names: list; name of every point, None gives 'g1', 'g2', ...
+    :return: str; the tree, the branch lengths are the difference in merge
+                distance between a cluster and the cluster it is merged into.
+
+    The tree is walked with a stack instead of recursion, so deep trees
+    (for example single linkage) do not reach the recursion limit.
+    """
+    num = len(linkage) + 1
+    if names is None:
+        names = ['g' + str(name) for name in range(1, num + 1)]
+    if num == 1:
+        return names[0] + ';'
+    heights = np.concatenate([np.zeros(num), linkage[:, 2]]).tolist()
+    parts = []
+    stack = [(2 * num - 2, None)]
+    while stack:
+        node, parent = stack.pop()
+        if isinstance(node, str):
+            parts.append(node)
+            continue
+        length = '' if parent is None else \
+            ':{:g}'.format(heights[parent] - heights[node])
+        if node < num:
+            parts.append(names[node] + length)
+        else:
+            left, right = linkage[node - num, :2].astype(int).tolist()
+            stack.extend([(')' + length, None), (right, node), (',', None),
+                          (left, node)])
+            parts.append('(')
+    return ''.join(parts) + ';'
+
+
+def main():
+    """This is the main function of the script"""
+    points, names, columns = load_csv(argv[1])
+    metric = argv[2] if len(argv) > 2 else 'euclidean'
+    method = argv[3] if len(argv) > 3 else 'average'
+    numbers = argv[4] if len(argv) > 4 else '2,3,5'
+    condensed = condensed_distances(points, metric)
+    linkage = cluster_points(condensed, len(points), method)
+    for num_clusters in map(int, numbers.split(',')):
+        print("{} clusters:".format(num_clusters))
+        labels = cut_tree(linkage, num_clusters)
+        for i, size in enumerate(np.bincount(labels).tolist()):
+            print('\t cluster {}: {} genes'.format(i + 1, size))
+    if len(argv) > 5:
+        with open(argv[5], 'w') as file:
+            file.write(newick(linkage, names) + '\n')
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
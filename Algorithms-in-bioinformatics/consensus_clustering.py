@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to judge how stable the clusters of a csv file
+are, with consensus clustering over resampled columns (time points).
+
+Usage: python [script.py] [csv file] [euclidean or correlation]
+       [linkage, one of METHODS of clustering_engine.py (optional, default
+       average)] [number of clusters (optional, default 3)]
+       [number of runs (optional, default 100)] [seed (optional)]
+       [processes (optional)]
+
+Every run draws the columns with replacement and clusters all points with
+clustering_engine.py. The runs are done by a pool of processes that get the
+data array once, and only send back the cluster of every point. The main
+process adds every run to a condensed array that counts how often two points
+were in the same cluster, so the memory use does not grow with the number of
+runs. The consensus clusters are the average linkage clustering of one minus
+the fraction of runs two points were together. The stability of a consensus
+cluster is the mean of that fraction over all pairs in the cluster (1 when
+the points were always together).
+"""
+# import statements
+import time
+from multiprocessing import Pool
+from sys import argv
+
+import numpy as np
+
+from clustering_engine import (BLOCK, cluster_members, cluster_points,
+                               condensed_distances, cut_tree)
+from expression_csv import load_csv
+
+DATA = {}  # the points and the settings of a worker process
+
+
+def init_worker(points, num_clusters, metric, method):
+    """Stores the points and the settings in a worker process.
+
+    :param points: numpy array; points x values.
+    :param num_clusters: int; number of clusters per run.
+    :param metric: str; 'euclidean' or 'correlation'.
+    :param method: str; one of METHODS of clustering_engine.py.
+    :return: None
+    """
+    DATA['points'] = points
+    DATA['settings'] = num_clusters, metric, method
+
+
+def cluster_run(seed_seq):
+    """Clusters the points on one resample of the columns.
+
+    :param seed_seq: numpy SeedSequence; the random stream of the run.
+    :return: numpy array; the cluster of every point.
+    """
+    num_clusters, metric, method = DATA['settings']
+    points = DATA['points']
+    rng = np.random.default_rng(seed_seq)
+    columns = rng.integers(points.shape[1], size=points.shape[1])
+    condensed = np.nan_to_num(condensed_distances(points[:, columns],
+                                                  metric))
+    linkage = cluster_points(condensed, len(points), method)
+    return cut_tree(linkage, num_clusters).astype(np.int32)
+
+
+def add_co_clustering(counts, labels):
+    """Counts the pairs of points that are in the same cluster.
+
+    :param counts: numpy array; condensed array of counts, changed in place.
+    :param labels: numpy array; the cluster of every point.
+    :return: None
+    """
+    step = max(1, BLOCK // max(len(labels), 1))
+    for start in range(1, len(labels), step):
+        end = min(len(labels), start + step)
+        lower = np.arange(end - 1) < np.arange(start, end)[:, None]
+        same = labels[start:end, None] == labels[:end - 1]
+        counts[start * (start - 1) // 2:end * (end - 1) // 2] += same[lower]
+
+
+def cluster_stability(consensus, labels):
+    """Calculates the mean consensus of the pairs in every cluster.
+
+    :param consensus: numpy array; condensed fraction of runs two points
+            were in the same cluster.
+    :param labels: numpy array; the consensus cluster of every point.
+    :return: numpy array; stability of every cluster (1 for a cluster of
+                one point).
+    """
+    num_clusters = int(labels.max(initial=-1)) + 1
+    totals = np.zeros(num_clusters)
+    step = max(1, BLOCK // max(len(labels), 1))
+    for start in range(1, len(labels), step):
+        end = min(len(labels), start + step)
+        lower = np.arange(end - 1) < np.arange(start, end)[:, None]
+        same = (labels[start:end, None] == labels[:end - 1])[lower]
+        pair_labels = np.broadcast_to(labels[start:end, None],
+                                      lower.shape)[lower]
+        totals += np.bincount(pair_labels[same], minlength=num_clusters,
+                              weights=consensus[start * (start - 1) // 2:
+                                                end * (end - 1) // 2][same])
+    sizes = np.bincount(labels, minlength=num_clusters)
+    pairs = sizes * (sizes - 1) / 2
+    return np.where(pairs > 0, totals / np.maximum(pairs, 1), 1.0)
+
+
+def consensus_clustering(points, num_clusters, runs=100, metric='euclidean',
+                         method='average', seed=None, processes=None):
+    """Makes the consensus clusters of resampled clusterings.
+
+    :param points: numpy array; points x values.
+    :param num_clusters: int; number of clusters.
+    :param runs: int; number of resampled clusterings.
+    :param metric: str; 'euclidean' or 'correlation'.
+    :param method: str; one of METHODS of clustering_engine.py.
+    :param seed: int; seed of the random numbers, None gives a random seed.
+    :param processes: int; number of processes, None uses all cores.
+    :return: tuple; the consensus cluster of every point, the stability of
+                every cluster (numpy arrays) and the condensed fraction of
+                runs two points were in the same cluster.
+
+    Every run has its own random stream spawned from the seed, so the result
+    does not depend on the number of processes.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    num = len(points)
+    counts = np.zeros(num * (num - 1) // 2, dtype=np.int32)
+    streams = np.random.SeedSequence(seed).spawn(runs)
+    with Pool(processes, initializer=init_worker,
+              initargs=(points, num_clusters, metric, method)) as pool:
+        for labels in pool.imap_unordered(cluster_run, streams):
+            add_co_clustering(counts, labels)
+    consensus = counts / max(runs, 1)
+    linkage = cluster_points(1 - consensus, num, 'average')
+    labels = cut_tree(linkage, num_clusters)
+    return labels, cluster_stability(consensus, labels), consensus
+
+
+def main():
+    """This is the main function of the script"""
+    points, names = load_csv(argv[1])[:2]
+    metric = argv[2] if len(argv) > 2 else 'euclidean'
+    method = argv[3] if len(argv) > 3 else 'average'
+    num_clusters = int(argv[4]) if len(argv) > 4 else 3
+    runs = int(argv[5]) if len(argv) > 5 else 100
+    seed = int(argv[6]) if len(argv) > 6 else None
+    processes = int(argv[7]) if len(argv) > 7 else None
+    labels, stability = consensus_clustering(
+        points, num_clusters, runs, metric, method, seed, processes)[:2]
+    members = cluster_members(labels, names)
+    for i, size in enumerate(np.bincount(labels).tolist()):
+        print('\t cluster {}: {} genes, stability {:.3f}'.format(
+            i + 1, size, stability[i]))
+        if size <= 10:
+            print('\t\t', members[i])
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
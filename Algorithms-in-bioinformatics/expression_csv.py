@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to read a (large) csv file of data points, in
+the format of csv_parser of hierarchical_clustering.py, into one float array.
+
+Usage: python [script.py] [csv file] [cache folder (optional)]
+
+Every line is a data point: a label followed by the values. The first line
+is the header when it is not all numbers. Unlike csv_parser the labels and
+the column names are kept, and missing values (empty, NA, NaN, ...) become
+nan. The lines are parsed in chunks: the values of a chunk are converted
+with one numpy call and put straight into the array.
+
+With a cache folder a binary copy of the result is kept there, one file
+per csv file that is overwritten when the csv file changed. The cache is
+used when the size and the modification time of the csv file still match,
+so the next run does not parse the file again. Only when the size matches
+but the modification time does not (for example a copied file) the SHA-1
+hash of the file is compared.
+"""
+# import statements
+import hashlib
+import os
+import time
+from itertools import chain
+from sys import argv
+
+import numpy as np
+
+MISSING = ['', 'NA', 'N/A', 'na', 'NaN', 'nan', 'null', 'NULL', '?']
+
+
+def file_hash(name):
+    """Calculates the SHA-1 hash of a file.
+
+    :param name: str; name of the file.
+    :return: str; the hash as hexadecimal string.
+    """
+    sha = hashlib.sha1()
+    with open(name, 'rb') as file:
+        for block in iter(lambda: file.read(2 ** 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def cache_name(name, cache_dir):
+    """Gives the name of the cache file of a csv file.
+
+    :param name: str; name of the csv file.
+    :param cache_dir: str; folder of the cache files.
+    :return: str; name of the cache file, the same for every version of the
+                csv file.
+    """
+    path = os.path.abspath(name)
+    digest = hashlib.sha1(path.encode()).hexdigest()
+    return os.path.join(cache_dir, '{}.{}.npz'.format(os.path.basename(path),
+                                                      digest[:16]))
+
+
+def parse_values(lines, width):
+    """Converts the values of a chunk of lines.
+
+    :param lines: list; lines without the label.
+    :param width: int; number of values per line.
+    :return: numpy array; lines x width values.
+
+    The C parser of np.loadtxt is tried first; only a chunk with missing
+    values (which loadtxt refuses) is converted field by field.
+    """
+    try:
+        values = np.loadtxt(lines, delimiter=',', comments=None, ndmin=2)
+        if values.shape == (len(lines), width):
+            return values
+    except ValueError:
+        pass
+    fields = np.array(','.join(lines).split(','))
+    if len(fields) != len(lines) * width:
+        raise ValueError("not every line has {} values".format(width))
+    missing = np.isin(np.char.strip(fields), MISSING)
+    values = np.full(len(fields), np.nan)
+    values[~missing] = fields[~missing].astype(np.float64)
+    return values.reshape(len(lines), width)
+
+
+def is_header(line):
+    """Tells whether a line is the header.
+
+    :param line: str; first line of the file.
+    :return: bool; True when a value (after the label) is not a number.
+    """
+    for field in line.split(',')[1:]:
+        if field.strip() in MISSING:
+            continue
+        try:
+            float(field)
+        except ValueError:
+            return True
+    return False
+
+
+def parse_csv(name, chunk_size=10000):
+    """Parses a csv file of data points.
+
+    :param name: str; name of the csv file.
+    :param chunk_size: int; number of lines converted at once.
+    :return: tuple; the values (points x values array), the labels of the
+                points and the column names (None without header).
+    """
+    with open(name, 'rb') as file:
+        num_lines = sum(block.count(b'\n') for block in
+                        iter(lambda: file.read(2 ** 20), b'')) + 1
+    with open(name) as file:
+        first = file.readline().rstrip('\r\n')
+        columns = None
+        if is_header(first):
+            columns = [field.strip() for field in first.split(',')[1:]]
+            first = file.readline().rstrip('\r\n')
+        width = first.count(',') if columns is None else len(columns)
+        data = np.empty((num_lines, width))
+        labels = []
+        chunk = []
+        row = 0
+        for line in chain([first], file):
+            line = line.rstrip('\r\n')
+            if not line.strip():
+                continue
+            label, _, values = line.partition(',')
+            labels.append(label.strip())
+            chunk.append(values)
+            if len(chunk) == chunk_size:
+                data[row:row + len(chunk)] = parse_values(chunk, width)
+                row += len(chunk)
+                chunk = []
+        if chunk:
+            data[row:row + len(chunk)] = parse_values(chunk, width)
+            row += len(chunk)
+    return data[:row], labels, columns
+
+
+def load_csv(name, chunk_size=10000, cache_dir=None):
+    """Loads a csv file of data points, from the cache when possible.
+
+    :param name: str; name of the csv file.
+    :param chunk_size: int; number of lines converted at once.
+    :param cache_dir: str; folder of the cache files (made when missing),
+                None parses the file without cache.
+    :return: tuple; the values (points x values array), the labels of the
+                points and the column names (None without header).
+    """
+    if cache_dir is None:
+        return parse_csv(name, chunk_size)
+    stat = os.stat(name)
+    saved = cache_name(name, cache_dir)
+    digest = None
+    if os.path.exists(saved):
+        with np.load(saved) as stored:
+            if int(stored['size']) == stat.st_size:
+                if int(stored['mtime']) != stat.st_mtime_ns:
+                    digest = file_hash(name)
+                if digest is None or str(stored['digest']) == digest:
+                    columns = stored['columns'].tolist() if \
+                        stored['has_columns'] else None
+                    return stored['data'], stored['labels'].tolist(), columns
+    data, labels, columns = parse_csv(name, chunk_size)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(saved + '.tmp', 'wb') as file:
+            np.savez(file, data=data, labels=np.array(labels, dtype=str),
+                     columns=np.array(columns or [], dtype=str),
+                     has_columns=columns is not None, size=stat.st_size,
+                     mtime=stat.st_mtime_ns,
+                     digest=digest or file_hash(name))
+        os.replace(saved + '.tmp', saved)
+    except OSError:  # for example a folder without write permission
+        pass
+    return data, labels, columns
+
+
+def main():
+    """This is the main function of the script"""
+    cache_dir = argv[2] if len(argv) > 2 else None
+    data, labels, columns = load_csv(argv[1], cache_dir=cache_dir)
+    print("{} data points with {} values".format(*data.shape))
+    print("columns:", columns)
+    print("missing values:", int(np.isnan(data).sum()))
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to read a (very large) FASTA file in chunks of
+sequences, shared by the scripts that stream FASTA files.
+
+Usage: python [script.py] [fasta file] [chunk size (optional, default 1000)]
+
+The file is read line by line and only one chunk of sequences is kept in
+memory at a time. The headers are kept without the '>'.
+"""
+# Import statements
+import time
+from sys import argv
+
+
+def read_fasta_chunks(name, chunk_size):
+    """Reads a FASTA file in chunks of sequences.
+
+    :param name: str; name of the FASTA file.
+    :param chunk_size: int; number of sequences per chunk.
+    :return: generator; lists of (header, sequence) tuples.
+    """
+    chunk = []
+    header = None
+    seq = []
+    with open(name) as file:
+        for line in file:
+            line = line.strip()
+            if line.startswith('>'):
+                if header is not None:
+                    chunk.append((header, ''.join(seq)))
+                    if len(chunk) == chunk_size:
+                        yield chunk
+                        chunk = []
+                header = line[1:]
+                seq = []
+            elif line:
+                seq.append(line)
+    if header is not None:
+        chunk.append((header, ''.join(seq)))
+    if chunk:
+        yield chunk
+
+
+def main():
+    """This is the main function of the script"""
+    chunk_size = int(argv[2]) if len(argv) > 2 else 1000
+    num_seqs = 0
+    num_residues = 0
+    for chunk in read_fasta_chunks(argv[1], chunk_size):
+        num_seqs += len(chunk)
+        num_residues += sum(len(seq) for header, seq in chunk)
+    print("{} sequences, {} residues".format(num_seqs, num_residues))
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
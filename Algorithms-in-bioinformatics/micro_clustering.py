@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to cluster data sets that are too large for
+the exact hierarchical clustering (millions of cells), in two stages.
+
+Usage: python [script.py] [csv file] [euclidean or correlation]
+       [linkage, one of METHODS of clustering_engine.py (optional, default
+       average)] [number of clusters (optional, default 5)]
+       [number of micro-clusters (optional, default 2000)]
+       [size of the exact sample (optional, default 2000)]
+
+First the points are compressed into a few thousand micro-clusters with
+mini-batch k-means: the points are read in batches and every batch moves the
+centres it is assigned to a step towards its points, with a step size of one
+over the number of points the centre has seen. Then the centres are clustered
+with the linkage of clustering_engine.py, where every centre counts for the
+number of points it stands for, and every point gets the cluster of its
+centre.
+
+The agreement with the exact clustering is measured on a random sample of
+the points: the sample is clustered exactly and compared to the two-stage
+clusters of the same points with the adjusted Rand index (1 is the same
+clustering, around 0 is chance).
+"""
+# import statements
+import time
+from sys import argv
+
+import numpy as np
+
+from clustering_engine import (BLOCK, cluster_points, condensed_distances,
+                               cut_tree, prepare_points)
+from expression_csv import load_csv
+
+
+def nearest_centres(values, centres):
+    """Finds the closest centre of every point.
+
+    :param values: numpy array; points x values.
+    :param centres: numpy array; centres x values.
+    :return: numpy array, numpy array; the closest centre of every point and
+                the squared distance to it.
+
+    The squared distances come from one matrix product per block of points
+    (|a - c|^2 = |a|^2 + |c|^2 - 2 a.c), like distance_block.
+    """
+    centre_norms = (centres ** 2).sum(axis=1)
+    labels = np.empty(len(values), dtype=np.int64)
+    dis = np.empty(len(values))
+    step = max(1, BLOCK // max(len(centres), 1))
+    for start in range(0, len(values), step):
+        block = values[start:start + step]
+        product = block @ centres.T
+        product *= -2
+        product += centre_norms
+        labels[start:start + step] = product.argmin(axis=1)
+        dis[start:start + step] = np.maximum(
+            product[np.arange(len(block)), labels[start:start + step]] +
+            (block ** 2).sum(axis=1), 0)
+    return labels, dis
+
+
+def seed_centres(values, num_centres, rng, sample_size=None):
+    """Chooses the starting centres with k-means++ on a sample.
+
+    :param values: numpy array; points x values.
+    :param num_centres: int; number of centres.
+    :param rng: numpy Generator; the random numbers.
+    :param sample_size: int; number of points the centres are chosen from,
+            None gives ten times the number of centres.
+    :return: numpy array; centres x values.
+
+    Every next centre is a point of the sample, picked with a chance
+    proportional to its squared distance to the closest centre so far.
+    """
+    sample_size = sample_size or 10 * num_centres
+    sample = values[np.sort(rng.choice(len(values), min(sample_size,
+                                                        len(values)),
+                                       replace=False))]
+    num_centres = min(num_centres, len(sample))
+    centres = np.empty((num_centres, values.shape[1]))
+    centres[0] = sample[rng.integers(len(sample))]
+    closest = ((sample - centres[0]) ** 2).sum(axis=1)
+    for i in range(1, num_centres):
+        total = closest.sum()
+        if total > 0:
+            pick = int(np.searchsorted(np.cumsum(closest),
+                                       rng.random() * total, side='right'))
+            pick = min(pick, len(sample) - 1)
+        else:  # fewer different points than centres
+            pick = int(rng.integers(len(sample)))
+        centres[i] = sample[pick]
+        np.minimum(closest, ((sample - centres[i]) ** 2).sum(axis=1),
+                   out=closest)
+    return centres
+
+
+def minibatch_kmeans(values, num_centres, batch_size=4096, passes=3,
+                     seed=None):
+    """Compresses the points into micro-clusters with mini-batch k-means.
+
+    :param values: numpy array; points x values (can be a memory map).
+    :param num_centres: int; number of micro-clusters.
+    :param batch_size: int; number of points per batch.
+    :param passes: int; number of times every batch is used.
+    :param seed: int; seed of the random numbers, None gives a random seed.
+    :return: tuple of numpy arrays; the centres, the micro-cluster of every
+                point and the number of points per micro-cluster. Centres
+                without points are removed.
+
+    The batches are consecutive slices of the points in a random order, so
+    a memory map is read in large pieces. A centre that was assigned m
+    points of a batch moves to
+        centre + (sum of the points - m centre) / (points seen so far)
+    which is the running mean of all points it was given.
+    """
+    rng = np.random.default_rng(seed)
+    centres = seed_centres(values, num_centres, rng)
+    seen = np.zeros(len(centres))
+    starts = np.arange(0, len(values), batch_size)
+    for _ in range(passes):
+        for start in rng.permutation(starts).tolist():
+            batch = np.asarray(values[start:start + batch_size])
+            labels = nearest_centres(batch, centres)[0]
+            counts = np.bincount(labels, minlength=len(centres))
+            sums = np.zeros_like(centres)
+            np.add.at(sums, labels, batch)
+            hit = counts > 0
+            seen[hit] += counts[hit]
+            centres[hit] += (sums[hit] - counts[hit, None] * centres[hit]) / \
+                seen[hit, None]
+    labels = nearest_centres(values, centres)[0]
+    sizes = np.bincount(labels, minlength=len(centres))
+    used = sizes > 0
+    renumber = np.cumsum(used) - 1
+    return centres[used], renumber[labels], sizes[used]
+
+
+def two_stage_clustering(points, num_clusters, metric='euclidean',
+                         method='average', num_centres=2000, seed=None):
+    """Clusters the points through micro-clusters.
+
+    :param points: numpy array; points x values.
+    :param num_clusters: int; number of clusters.
+    :param metric: str; 'euclidean' or 'correlation'.
+    :param method: str; one of METHODS of clustering_engine.py.
+    :param num_centres: int; number of micro-clusters.
+    :param seed: int; seed of the random numbers, None gives a random seed.
+    :return: tuple; the cluster of every point (numpy array) and the linkage
+                array of the micro-clusters.
+
+    The micro-clusters are made on the values of prepare_points, so for the
+    correlation the rows are standardized first (the Euclidean distance of
+    standardized rows grows with one minus the correlation). Missing values
+    and constant rows count as zeros there.
+    """
+    values = np.nan_to_num(prepare_points(points, metric)[0])
+    centres, micro, sizes = minibatch_kmeans(values, num_centres, seed=seed)
+    condensed = np.nan_to_num(condensed_distances(centres, metric))
+    linkage = cluster_points(condensed, len(centres), method, sizes)
+    return cut_tree(linkage, num_clusters)[micro], linkage
+
+
+def pair_count(counts):
+    """Counts the pairs within groups.
+
+    :param counts: numpy array; number of points per group.
+    :return: int; number of pairs of points in the same group.
+    """
+    return int((counts * (counts - 1) // 2).sum())
+
+
+def adjusted_rand_index(labels_a, labels_b):
+    """Measures how well two clusterings of the same points agree.
+
+    :param labels_a: numpy array; cluster of every point in clustering one.
+    :param labels_b: numpy array; cluster of every point in clustering two.
+    :return: float; the adjusted Rand index, 1 for the same clustering and
+                around 0 for clusterings that agree only by chance.
+    """
+    both = np.unique(np.stack([labels_a, labels_b]), axis=1,
+                     return_counts=True)[1]
+    together = pair_count(both)
+    pairs_a = pair_count(np.unique(labels_a, return_counts=True)[1])
+    pairs_b = pair_count(np.unique(labels_b, return_counts=True)[1])
+    chance = pairs_a * pairs_b / max(pair_count(np.array(len(labels_a))), 1)
+    best = (pairs_a + pairs_b) / 2
+    if best == chance:
+        return 1.0
+    return float((together - chance) / (best - chance))
+
+
+def compare_exact(points, labels, num_clusters, metric='euclidean',
+                  method='average', sample_size=2000, seed=None):
+    """Compares the two-stage clusters to the exact clusters of a sample.
+
+    :param points: numpy array; points x values.
+    :param labels: numpy array; the two-stage cluster of every point.
+    :param num_clusters: int; number of clusters.
+    :param metric: str; 'euclidean' or 'correlation'.
+    :param method: str; one of METHODS of clustering_engine.py.
+    :param sample_size: int; number of points clustered exactly.
+    :param seed: int; seed of the random numbers, None gives a random seed.
+    :return: tuple; the adjusted Rand index and the time of the exact
+                clustering in seconds.
+    """
+    rng = np.random.default_rng(seed)
+    sample = np.sort(rng.choice(len(points), min(sample_size, len(points)),
+                                replace=False))
+    start_time = time.time()
+    condensed = condensed_distances(points[sample], metric)
+    exact = cut_tree(cluster_points(condensed, len(sample), method),
+                     num_clusters)
+    exact_time = time.time() - start_time
+    return adjusted_rand_index(exact, labels[sample]), exact_time
+
+
+def main():
+    """This is the main function of the script"""
+    points = load_csv(argv[1])[0]
+    metric = argv[2] if len(argv) > 2 else 'euclidean'
+    method = argv[3] if len(argv) > 3 else 'average'
+    num_clusters = int(argv[4]) if len(argv) > 4 else 5
+    num_centres = int(argv[5]) if len(argv) > 5 else 2000
+    sample_size = int(argv[6]) if len(argv) > 6 else 2000
+    start_time = time.time()
+    labels, linkage = two_stage_clustering(points, num_clusters, metric,
+                                           method, num_centres, seed=1)
+    print("two-stage clustering of {} points: {:.2f} s".format(
+        len(points), time.time() - start_time))
+    for i, size in enumerate(np.bincount(labels).tolist()):
+        print('\t cluster {}: {} genes'.format(i + 1, size))
+    agreement, exact_time = compare_exact(points, labels, num_clusters,
+                                          metric, method, sample_size, seed=1)
+    print("exact clustering of a sample of {} points: {:.2f} s".format(
+        min(sample_size, len(points)), exact_time))
+    print("adjusted Rand index: {:.3f}".format(agreement))
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to estimate the distance between many DNA
+sequences (for example whole genomes) without aligning them, with MinHash
+sketches of their k-mers, and to cluster the sequences on that distance.
+
+Usage: python [script.py] [fasta file] [k-mer length (optional, default 21)]
+       [sketch size (optional, default 1000)]
+       [newick output file (optional)] [processes (optional)]
+
+Every k-mer is counted in its canonical form (the smallest of the k-mer and
+its reverse complement, as 2-bit codes in one 64-bit number), so both strands
+of a sequence give the same sketch. K-mers with other letters than ACGT are
+skipped. The canonical k-mers are hashed and the sketch of a sequence is the
+set of its s smallest distinct hashes (bottom-s MinHash). Long sequences are
+hashed in windows; after the first window only hashes below the largest
+one in the sketch are kept. The FASTA file is read in chunks of sequences
+that are sketched by a pool of processes.
+
+For two sketches a and b the hashes up to t, the smallest of their two
+largest hashes, are the bottom sets of both sequences at the same threshold.
+Their Jaccard index is estimated as
+    shared / (number of a up to t + number of b up to t - shared)
+and the Mash distance is -1/k ln(2 j / (1 + j)), an estimate of the fraction
+of mutated bases. The shared hashes are counted with an index from hash to
+sequences, so the time grows with the number of pairs that share hashes,
+not with the sketch size times all pairs. The distances are a condensed
+array like clustering_engine.py uses.
+"""
+# import statements
+import time
+from collections import deque
+from multiprocessing import Pool, cpu_count
+from sys import argv
+
+import numpy as np
+
+from clustering_engine import cluster_points, condensed_index, cut_tree, newick
+from fasta_reader import read_fasta_chunks
+
+CODES = np.full(256, 4, dtype=np.uint8)  # 2-bit code per ASCII letter
+for code, letters in enumerate(['Aa', 'Cc', 'Gg', 'Tt']):
+    CODES[[ord(letter) for letter in letters]] = code
+WINDOW = 2 ** 20  # number of k-mers hashed at once
+SETTINGS = {}  # k, sketch size and seed of a worker process
+
+
+def hash_values(values, seed=0):
+    """Hashes 64-bit numbers (the finalizer of MurmurHash3).
+
+    :param values: numpy array; uint64 numbers.
+    :param seed: int; changes the hash function.
+    :return: numpy array; uint64 hashes.
+    """
+    values = values ^ np.uint64(seed)
+    values ^= values >> np.uint64(33)
+    values *= np.uint64(0xff51afd7ed558ccd)
+    values ^= values >> np.uint64(33)
+    values *= np.uint64(0xc4ceb9fe1a85ec53)
+    values ^= values >> np.uint64(33)
+    return values
+
+
+def canonical_kmers(codes, k):
+    """Gives the canonical k-mers of a piece of sequence.
+
+    :param codes: numpy array; 2-bit code of every base, 4 for others.
+    :param k: int; k-mer length (at most 32).
+    :return: numpy array; uint64 canonical k-mers, without the k-mers that
+                contain another letter than ACGT.
+    """
+    num = len(codes) - k + 1
+    if num < 1:
+        return np.empty(0, dtype=np.uint64)
+    bad = np.concatenate([[0], np.cumsum(codes > 3)])
+    valid = bad[k:] == bad[:num]
+    bases = np.where(codes > 3, 0, codes).astype(np.uint64)
+    forward = np.zeros(num, dtype=np.uint64)
+    reverse = np.zeros(num, dtype=np.uint64)
+    for j in range(k):
+        forward <<= np.uint64(2)
+        forward |= bases[j:j + num]
+        reverse |= (np.uint64(3) - bases[j:j + num]) << np.uint64(2 * j)
+    return np.minimum(forward, reverse)[valid]
+
+
+def sketch_sequence(seq, k=21, size=1000, seed=0):
+    """Makes the bottom-s MinHash sketch of a sequence.
+
+    :param seq: str; DNA sequence.
+    :param k: int; k-mer length (at most 32).
+    :param size: int; maximum number of hashes in the sketch.
+    :param seed: int; changes the hash function.
+    :return: numpy array; the smallest distinct hashes, sorted.
+    """
+    codes = CODES[np.frombuffer(seq.encode(), dtype=np.uint8)]
+    sketch = np.empty(0, dtype=np.uint64)
+    for start in range(0, max(len(codes) - k + 1, 0), WINDOW):
+        hashes = hash_values(canonical_kmers(
+            codes[start:start + WINDOW + k - 1], k), seed)
+        if len(sketch) == size:
+            hashes = hashes[hashes < sketch[-1]]
+        sketch = np.union1d(sketch, hashes)[:size]
+    return sketch
+
+
+def init_worker(k, size, seed):
+    """Stores the sketch settings in a worker process.
+
+    :param k: int; k-mer length.
+    :param size: int; sketch size.
+    :param seed: int; changes the hash function.
+    :return: None
+    """
+    SETTINGS['settings'] = k, size, seed
+
+
+def sketch_chunk(chunk):
+    """Sketches a chunk of sequences (used by the process pool).
+
+    :param chunk: list of tuples; (header, sequence) per sequence.
+    :return: list of tuples; (header, sketch) per sequence.
+    """
+    k, size, seed = SETTINGS['settings']
+    return [(header, sketch_sequence(seq, k, size, seed))
+            for header, seq in chunk]
+
+
+def sketch_fasta(name, k=21, size=1000, seed=0, processes=None,
+                 chunk_size=10):
+    """Sketches every sequence of a FASTA file.
+
+    :param name: str; name of the FASTA file.
+    :param k: int; k-mer length (at most 32).
+    :param size: int; maximum number of hashes per sketch.
+    :param seed: int; changes the hash function.
+    :param processes: int; number of processes, None uses all cores.
+    :param chunk_size: int; number of sequences per chunk.
+    :return: tuple; list of the sequence names and list of the sketches.
+
+    Only a fixed number of chunks is waiting at any time, so only the
+    sketches are kept, not the sequences.
+    """
+    if not 0 < k <= 32:
+        raise ValueError("the k-mer length has to be 1 to 32")
+    processes = processes or cpu_count()
+    names = []
+    sketches = []
+    pending = deque()
+    with Pool(processes, initializer=init_worker,
+              initargs=(k, size, seed)) as pool:
+        for chunk in read_fasta_chunks(name, chunk_size):
+            if len(pending) >= 2 * processes:
+                for header, sketch in pending.popleft().get():
+                    names.append(header)
+                    sketches.append(sketch)
+            pending.append(pool.apply_async(sketch_chunk, (chunk,)))
+        while pending:
+            for header, sketch in pending.popleft().get():
+                names.append(header)
+                sketches.append(sketch)
+    return names, sketches
+
+
+def sketch_distances(sketches, k=21):
+    """Estimates the Jaccard index and Mash distance of all pairs.
+
+    :param sketches: list of numpy arrays; the sorted sketches.
+    :param k: int; k-mer length of the sketches.
+    :return: numpy array, numpy array; condensed Jaccard indexes and
+                condensed Mash distances (1 for sequences without shared
+                hashes).
+
+    The sketches are handled in the order of their largest hash. For every
+    sketch the number of hashes of all other sketches up to its largest
+    hash is kept up to date while walking through all hashes in order, so
+    the pairs with a later sketch get their threshold counts without
+    comparing the sketches.
+    """
+    num = len(sketches)
+    lengths = np.array([len(sketch) for sketch in sketches], dtype=np.int64)
+    largest = np.array([sketch[-1] if len(sketch) else 0
+                        for sketch in sketches], dtype=np.uint64)
+    owners = np.repeat(np.arange(num), lengths)
+    hashes = np.concatenate(sketches) if num else np.empty(0, np.uint64)
+    order = np.argsort(hashes, kind='stable')
+    hashes, owners = hashes[order], owners[order]
+    unique, first, counts = np.unique(hashes, return_index=True,
+                                      return_counts=True)
+    below = np.zeros(num, dtype=np.int64)
+    done = 0
+    jaccard = np.zeros(num * (num - 1) // 2)
+    rank = np.empty(num, dtype=np.int64)
+    sequence = np.argsort(largest, kind='stable')
+    rank[sequence] = np.arange(num)
+    for place, point in enumerate(sequence.tolist()):
+        if not lengths[point]:
+            continue
+        end = int(np.searchsorted(hashes, largest[point], side='right'))
+        np.add.at(below, owners[done:end], 1)
+        done = end
+        # every sequence sharing a hash with this one, once per shared hash
+        spots = np.searchsorted(unique, sketches[point])
+        starts, sizes = first[spots], counts[spots]
+        shared_owners = owners[np.repeat(starts - np.cumsum(sizes) + sizes,
+                                         sizes) + np.arange(sizes.sum())]
+        shared = np.bincount(shared_owners, minlength=num)
+        later = sequence[place + 1:]
+        later = later[lengths[later] > 0]
+        union = lengths[point] + below[later] - shared[later]
+        jaccard[condensed_index(point, later)] = shared[later] / union
+    with np.errstate(divide='ignore'):
+        mash = np.where(jaccard > 0, -np.log(2 * jaccard / (1 + jaccard)) / k,
+                        1.0)
+    return jaccard, np.minimum(mash, 1.0)
+
+
+def main():
+    """This is the main function of the script"""
+    k = int(argv[2]) if len(argv) > 2 else 21
+    size = int(argv[3]) if len(argv) > 3 else 1000
+    processes = int(argv[5]) if len(argv) > 5 else None
+    names, sketches = sketch_fasta(argv[1], k, size, processes=processes)
+    jaccard, mash = sketch_distances(sketches, k)
+    linkage = cluster_points(mash, len(names), 'average')
+    for num_clusters in (2, 3, 5):
+        print("{} clusters:".format(num_clusters))
+        labels = cut_tree(linkage, num_clusters)
+        for i, count in enumerate(np.bincount(labels).tolist()):
+            print('\t cluster {}: {} sequences'.format(i + 1, count))
+    if len(argv) > 4:
+        with open(argv[4], 'w') as file:
+            file.write(newick(linkage, names) + '\n')
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to cluster more data points than the distance
+matrix fits in memory (for example 150k proteomics features, where the
+matrix is about 45 GB in float32).
+
+Usage: python [script.py] [csv file] [distance file (.npy)]
+       [memory budget in MB (optional, default 1024)]
+       [euclidean or correlation (optional, default euclidean)]
+       [processes (optional)]
+
+The condensed distance array of clustering_engine.py is calculated in tiles
+of rows by a pool of processes, which write their tile straight into a
+memory-mapped float32 .npy file. The single linkage clustering reads the file
+from start to end in pieces that fit in the memory budget (Boruvka: every
+pass adds the shortest edge out of every cluster to the minimum spanning
+tree). The other linkages need the whole array in memory and are only done
+when it fits in the budget.
+"""
+# import statements
+import os
+import time
+from multiprocessing import Pool
+from sys import argv
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from clustering_engine import (METHODS, cluster_points, cut_tree,
+                               distance_block, linkage_array, prepare_points)
+from expression_csv import load_csv
+
+MATRIX = {}  # the points and the distance file of a worker process
+
+
+def row_tiles(num, tile):
+    """Divides the rows of the condensed array into tiles.
+
+    :param num: int; number of points.
+    :param tile: int; maximum number of distances per tile (a row is never
+            split, so a tile is at least one row).
+    :return: list of tuples; first and one past the last row of every tile.
+    """
+    offsets = np.arange(num + 1) * (np.arange(num + 1) - 1) // 2
+    bounds = [1]
+    while bounds[-1] < num:
+        start = bounds[-1]
+        end = int(np.searchsorted(offsets, offsets[start] + tile,
+                                  side='right')) - 1
+        bounds.append(min(num, max(end, start + 1)))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def init_worker(values, norms, name):
+    """Stores the points and opens the distance file in a worker process.
+
+    :param values: numpy array; the values made by prepare_points.
+    :param norms: numpy array; the row lengths made by prepare_points.
+    :param name: str; name of the distance file.
+    :return: None
+    """
+    MATRIX['values'] = values
+    MATRIX['norms'] = norms
+    MATRIX['file'] = np.load(name, mmap_mode='r+')
+
+
+def write_tile(bounds):
+    """Calculates one tile and writes it to the distance file.
+
+    :param bounds: tuple; first and one past the last row of the tile.
+    :return: int; number of distances written.
+    """
+    start, end = bounds
+    block = distance_block(MATRIX['values'], MATRIX['norms'], start, end)
+    MATRIX['file'][start * (start - 1) // 2:end * (end - 1) // 2] = block
+    MATRIX['file'].flush()
+    return len(block)
+
+
+def write_distance_file(points, name, metric='euclidean', processes=None,
+                        tile=2 ** 22):
+    """Calculates the condensed distances into a float32 .npy file.
+
+    :param points: numpy array; points x values.
+    :param name: str; name of the distance file.
+    :param metric: str; 'euclidean' or 'correlation'.
+    :param processes: int; number of processes, None uses all cores.
+    :param tile: int; number of distances per tile.
+    :return: None
+    """
+    values, norms = prepare_points(points, metric)
+    num = len(values)
+    open_memmap(name, mode='w+', dtype=np.float32,
+                shape=(num * (num - 1) // 2,)).flush()
+    with Pool(processes, initializer=init_worker,
+              initargs=(values, norms, name)) as pool:
+        for _ in pool.imap_unordered(write_tile, row_tiles(num, tile)):
+            pass
+
+
+def open_distance_file(name):
+    """Opens a distance file made by write_distance_file.
+
+    :param name: str; name of the distance file.
+    :return: numpy array, int; read-only memory map of the condensed array
+                and the number of points.
+    """
+    matrix = np.load(name, mmap_mode='r')
+    num = int(round((1 + np.sqrt(1 + 8 * len(matrix))) / 2)) if len(matrix) \
+        else 1
+    return matrix, num
+
+
+def find_roots(parent):
+    """Finds the root of every point in a union-find forest.
+
+    :param parent: numpy array; parent of every point.
+    :return: numpy array; root of every point.
+    """
+    while True:
+        jumped = parent[parent]
+        if (jumped == parent).all():
+            return parent
+        parent = jumped
+
+
+def shortest_edges(matrix, num, comp, memory):
+    """Finds the shortest edge from every point to another cluster.
+
+    :param matrix: numpy array; the condensed distances (memory map).
+    :param num: int; number of points.
+    :param comp: numpy array; cluster of every point.
+    :param memory: int; memory budget in bytes.
+    :return: numpy array, numpy array; length of the shortest edge of every
+                point (inf when there is none) and the point at the other
+                end.
+
+    The file is read once from start to end. Every piece is spread into a
+    rectangle of rows, so the shortest edges of the rows and of the columns
+    are both a minimum along one axis.
+    """
+    best = np.full(num, np.inf)
+    partner = np.full(num, -1, dtype=np.int64)
+    for start, end in row_tiles(num, max(num, memory // 24)):
+        dense = np.full((end - start, end - 1), np.inf, dtype=np.float32)
+        lower = np.arange(end - 1) < np.arange(start, end)[:, None]
+        dense[lower] = matrix[start * (start - 1) // 2:end * (end - 1) // 2]
+        dense[comp[start:end, None] == comp[:end - 1]] = np.inf
+        rows = np.arange(end - start)
+        near = dense.argmin(axis=1)
+        dis = dense[rows, near]
+        better = dis < best[start:end]
+        best[start:end][better] = dis[better]
+        partner[start:end][better] = near[better]
+        cols = np.arange(end - 1)
+        near = dense.argmin(axis=0)
+        dis = dense[near, cols]
+        better = dis < best[:end - 1]
+        best[:end - 1][better] = dis[better]
+        partner[:end - 1][better] = near[better] + start
+    return best, partner
+
+
+def boruvka_single_linkage(matrix, num, memory=2 ** 30):
+    """Makes the single linkage clustering from a distance file.
+
+    :param matrix: numpy array; the condensed distances (memory map).
+    :param num: int; number of points.
+    :param memory: int; memory budget in bytes.
+    :return: numpy array; the linkage array made by linkage_array.
+
+    The single linkage tree is the minimum spanning tree with its edges
+    sorted on length. Every pass over the file adds the shortest edge out
+    of every cluster, which at least halves the number of clusters. Points
+    without any finite distance to the rest are joined at infinity.
+    """
+    parent = np.arange(num)
+    edges = []
+    while len(edges) < num - 1:
+        comp = find_roots(parent)
+        best, partner = shortest_edges(matrix, num, comp, memory)
+        order = np.lexsort((best, comp))
+        first = order[np.r_[True, comp[order][1:] != comp[order][:-1]]]
+        first = first[np.isfinite(best[first])]
+        if not len(first):
+            break
+        for point in first[np.argsort(best[first], kind='stable')].tolist():
+            ends = []
+            for node in (point, int(partner[point])):
+                while parent[node] != node:
+                    parent[node] = parent[parent[node]]
+                    node = parent[node]
+                ends.append(node)
+            if ends[0] != ends[1]:
+                parent[ends[0]] = ends[1]
+                edges.append((point, partner[point], best[point]))
+    roots = np.flatnonzero(find_roots(parent) == np.arange(num)).tolist()
+    edges.extend((root, roots[0], np.inf) for root in roots[1:])
+    return linkage_array(np.array(edges, dtype=np.float64).reshape(-1, 3),
+                         num)
+
+
+def cluster_file(name, method='single', memory=2 ** 30):
+    """Clusters the points of a distance file.
+
+    :param name: str; name of the distance file.
+    :param method: str; one of METHODS of clustering_engine.py.
+    :param memory: int; memory budget in bytes.
+    :return: numpy array; the linkage array made by linkage_array.
+
+    Only single linkage reads the file in pieces. The other methods update a
+    float64 copy of the whole array, so they raise a ValueError when that
+    copy and the arrays per point do not fit in the memory budget.
+    """
+    if method not in METHODS:
+        raise ValueError("unknown method {}".format(method))
+    matrix, num = open_distance_file(name)
+    if method == 'single':
+        return boruvka_single_linkage(matrix, num, memory)
+    # the working copy in float64 and about eight arrays per point
+    needed = len(matrix) * 8 + num * 64
+    if needed > memory:
+        raise ValueError("{} linkage needs {} MB but the budget is {} MB, "
+                         "only single linkage works within the budget"
+                         .format(method, -(-needed // 2 ** 20),
+                                 memory // 2 ** 20))
+    return cluster_points(np.asarray(matrix), num, method)
+
+
+def main():
+    """This is the main function of the script"""
+    memory = int(argv[3]) * 2 ** 20 if len(argv) > 3 else 2 ** 30
+    metric = argv[4] if len(argv) > 4 else 'euclidean'
+    processes = int(argv[5]) if len(argv) > 5 else None
+    if not os.path.exists(argv[2]):
+        points = load_csv(argv[1])[0]
+        write_distance_file(points, argv[2], metric, processes)
+    linkage = cluster_file(argv[2], 'single', memory)
+    for num_clusters in (2, 3, 5):
+        print("{} clusters:".format(num_clusters))
+        labels = cut_tree(linkage, num_clusters)
+        for i, size in enumerate(np.bincount(labels).tolist()):
+            print('\t cluster {}: {} genes'.format(i + 1, size))
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to create the profile Hidden Markov Model of
+Hidden_Markov_Model.py from large alignments.
+
+Usage: python [script.py] [aligned fasta file]
+
+The alignment is loaded once into a 2-D uint8 array (sequences x columns,
+ASCII codes). The match columns, transition counts and emission counts are
+calculated with array operations on blocks of that array. The normalisation
+is done by the functions of Hidden_Markov_Model.py, so norm_trans and
+norm_matches are identical to the ones made by Hidden_Markov_Model.main.
+"""
+# Import statements
+import time
+from sys import argv
+
+import numpy as np
+
+from Hidden_Markov_Model import (normalize_match_states,
+                                 normalize_transition_dic, pa, parse_fasta)
+
+GAP = ord('-')
+NAMES = ['MM', 'MI', 'MD', 'IM', 'II', 'ID', 'DM', 'DI', 'DD']
+BLOCK = 2 ** 22  # number of alignment cells handled at once
+
+
+def load_alignment(seqs):
+    """Loads aligned sequences into a 2-D array.
+
+    :param seqs: list; protein sequence alignments.
+    :return: numpy array; uint8 matrix of sequences x columns with the ASCII
+                code of every position.
+    """
+    length = len(seqs[0])
+    if any(len(seq) != length for seq in seqs):
+        raise ValueError("the sequences are not aligned (unequal lengths)")
+    raw = np.frombuffer(''.join(seqs).encode(), dtype=np.uint8)
+    return raw.reshape(len(seqs), length)
+
+
+def gap_counts(alignment):
+    """Counts the gaps in every column of the alignment.
+
+    :param alignment: numpy array; uint8 matrix of sequences x columns.
+    :return: numpy array; number of gaps per column.
+    """
+    counts = np.zeros(alignment.shape[1], dtype=np.int64)
+    step = max(1, BLOCK // max(alignment.shape[1], 1))
+    for start in range(0, len(alignment), step):
+        counts += (alignment[start:start + step] == GAP).sum(axis=0)
+    return counts
+
+
+def guide_array(gaps, num_seqs):
+    """Finds the columns that are match states for the transitions.
+
+    :param gaps: numpy array; number of gaps per column.
+    :param num_seqs: int; number of sequences in the alignment.
+    :return: numpy array; True for a match state ('M' in guide_list).
+    """
+    return 2 * gaps <= num_seqs
+
+
+def emission_columns(gaps, num_seqs):
+    """Finds the columns that are match states for the emissions.
+
+    :param gaps: numpy array; number of gaps per column.
+    :param num_seqs: int; number of sequences in the alignment.
+    :return: numpy array; indices of the columns gather_match_states uses.
+
+    gather_match_states only uses a column when less than half of it are
+    gaps, where guide_list also calls a column with exactly half gaps a
+    match state. Both rules are kept to give identical models.
+    """
+    return np.flatnonzero(2 * gaps < num_seqs)
+
+
+def count_transitions(alignment, guide):
+    """Counts the transitions from a match state to the next.
+
+    :param alignment: numpy array; uint8 matrix of sequences x columns.
+    :param guide: numpy array; True for the columns that are match states.
+    :return: numpy array; 9 x (number of match states + 1) counts, the rows
+                are the transition types in the order of NAMES.
+
+    Every position gets a state code: M (1) or D (3) in a match column, I (2)
+    or nothing (0) in an insert column. The state before a position is the
+    last code before it in the row (M at the start). The pair of the two
+    states and the number of match columns before the position give the
+    place in the count table, which is filled with one bincount per block.
+    """
+    num_cols = alignment.shape[1]
+    num_match = int(guide.sum())
+    pos = (np.cumsum(guide) - guide).astype(np.int32)
+    cols = np.arange(num_cols, dtype=np.int32) * 4
+    counts = np.zeros(9 * (num_match + 1) + 1, dtype=np.int64)
+    step = max(1, BLOCK // max(num_cols, 1))
+    for start in range(0, len(alignment), step):
+        residue = alignment[start:start + step] != GAP
+        codes = np.where(guide, np.where(residue, 1, 3),
+                         np.where(residue, 2, 0)).astype(np.int32)
+        # column * 4 + code of the last state up to and including a column
+        last = np.maximum.accumulate(np.where(codes > 0, cols + codes, 1),
+                                     axis=1)
+        prev = np.ones_like(codes)
+        prev[:, 1:] = last[:, :-1] & 3
+        keys = ((prev - 1) * 3 + codes - 1) * (num_match + 1) + pos
+        keys[codes == 0] = len(counts) - 1
+        counts += np.bincount(keys.ravel(), minlength=len(counts))
+        end = last[:, -1] & 3 if num_cols else np.ones(len(codes), np.int32)
+        counts += np.bincount((end - 1) * 3 * (num_match + 1) + num_match,
+                              minlength=len(counts))
+    counts = counts[:-1]
+    return counts.reshape(9, num_match + 1)
+
+
+def count_emissions(alignment, columns):
+    """Counts the residues of every match state.
+
+    :param alignment: numpy array; uint8 matrix of sequences x columns.
+    :param columns: numpy array; indices of the match state columns.
+    :return: numpy array, numpy array; counts and the first sequence it
+                occurs in, both match states x 256 (ASCII codes).
+    """
+    counts = np.zeros((len(columns), 256), dtype=np.int64)
+    first = np.zeros((len(columns), 256), dtype=np.int64)
+    step = max(1, BLOCK // max(len(alignment), 1))
+    for start in range(0, len(columns), step):
+        block = alignment[:, columns[start:start + step]]
+        keys = block + np.arange(block.shape[1]) * 256
+        counts[start:start + step] = np.bincount(
+            keys.ravel(), minlength=block.shape[1] * 256).reshape(-1, 256)
+        for code in np.flatnonzero(counts[start:start + step].any(axis=0)):
+            first[start:start + step, code] = (block == code).argmax(axis=0)
+    return counts, first
+
+
+def gather_match_arrays(counts, first):
+    """Turns the emission counts into the format of gather_match_states.
+
+    :param counts: numpy array; match states x 256 residue counts.
+    :param first: numpy array; match states x 256 first occurrence.
+    :return: dictionary; the key is match state position in a sequence; the
+                value is a list of lists with a sublist containing the
+                occurrence of the protein.
+
+    The residues are listed in the order they first occur in the column,
+    like the counting dictionary of gather_match_states does.
+    """
+    counts[:, GAP] = 0
+    match = {}
+    for m_state in range(len(counts)):
+        codes = np.flatnonzero(counts[m_state])
+        codes = codes[np.argsort(first[m_state, codes], kind='stable')]
+        match[m_state] = [[chr(code), count] for code, count in
+                          zip(codes.tolist(), counts[m_state, codes].tolist())]
+    return match
+
+
+def build_profile(alignment):
+    """Creates the profile HMM from an alignment array.
+
+    :param alignment: numpy array; uint8 matrix of sequences x columns.
+    :return: tuple of two dictionaries; norm_trans and norm_matches as made
+                by Hidden_Markov_Model.main.
+    """
+    gaps = gap_counts(alignment)
+    trans = count_transitions(alignment, guide_array(gaps, len(alignment)))
+    trans_dic = {name: trans[i].tolist() for i, name in enumerate(NAMES)}
+    norm_trans = normalize_transition_dic(trans_dic)
+    counts, first = count_emissions(alignment,
+                                    emission_columns(gaps, len(alignment)))
+    norm_matches = normalize_match_states(gather_match_arrays(counts, first))
+    return norm_trans, norm_matches
+
+
+def alias_table(weights):
+    """Makes alias tables for sampling from rows of weights.
+
+    :param weights: numpy array; rows x options with the weight (probability)
+                of every option. The weights do not have to add up to one.
+    :return: tuple of numpy arrays; the acceptance probability and the alias
+                of every option (both rows x options) and per row whether its
+                total weight is larger than zero.
+
+    With these tables one option can be picked with a single random number
+    in constant time (Vose's alias method).
+    """
+    rows, width = weights.shape
+    prob = np.ones((rows, width))
+    alias = np.tile(np.arange(width), (rows, 1))
+    total = weights.sum(axis=1)
+    for row in np.flatnonzero(total > 0):
+        scaled = (weights[row] * width / total[row]).tolist()
+        small = [i for i, value in enumerate(scaled) if value < 1]
+        large = [i for i, value in enumerate(scaled) if value >= 1]
+        while small and large:
+            less = small.pop()
+            more = large[-1]
+            prob[row, less] = scaled[less]
+            alias[row, less] = more
+            scaled[more] -= 1 - scaled[less]
+            if scaled[more] < 1:
+                small.append(large.pop())
+        for i in small:  # only left over by rounding errors
+            prob[row, i] = 1
+    return prob, alias, total > 0
+
+
+def emission_table(options, rows):
+    """Makes the alias tables of the emissions.
+
+    :param options: list of lists; every list contains [key, probability]
+                sublists, one list per position.
+    :param rows: int; number of positions in the table.
+    :return: tuple; the ASCII codes of the keys (rows x the most keys at one
+                position) followed by the alias tables of alias_table.
+    """
+    width = max([len(option) for option in options] + [1])
+    codes = np.zeros((rows, width), dtype=np.uint8)
+    weights = np.zeros((rows, width))
+    for row, option in enumerate(options):
+        codes[row, :len(option)] = [ord(key) for key, prob in option]
+        weights[row, :len(option)] = [prob for key, prob in option]
+    return (codes,) + alias_table(weights)
+
+
+def compile_sampler(norm_trans, norm_matches, background=pa):
+    """Precomputes the sampling tables of the profile HMM.
+
+    :param norm_trans: dictionary; the keys are the transition types. The
+                    values is a list of probabilities per position in a
+                    sequence
+    :param norm_matches: dictionary; the key is match state position in a
+                    sequence; the value is a list of lists with a sublist
+                    containing the probability of occurrence of the protein.
+    :param background: dictionary; probability of every residue in the
+                    insert states.
+    :return: dictionary; the alias tables of the transitions ('trans', one
+                row per state M, I, D and position), of the match emissions
+                ('match') and of the insert emissions ('insert'), and the
+                number of match states ('length').
+
+    This is done once per model, sample_batch uses the tables for every
+    sequence.
+    """
+    length = len(norm_trans['MM']) - 1
+    trans = np.array([norm_trans[name] for name in NAMES], dtype=np.float64)
+    trans = trans.reshape(3, 3, length + 1).transpose(0, 2, 1)
+    return {'trans': alias_table(trans.reshape(-1, 3)),
+            'match': emission_table(
+                [norm_matches.get(pos, []) for pos in range(length)], length),
+            'insert': emission_table([list(background.items())], 1),
+            'length': length}
+
+
+def pick(table, rows, rng):
+    """Picks an option for every row with the alias tables.
+
+    :param table: tuple of numpy arrays; the alias tables of alias_table.
+    :param rows: numpy array; the row of the table to pick from, per sample.
+    :param rng: numpy Generator; source of the random numbers.
+    :return: numpy array; the picked option per sample.
+
+    Like random.choices a row with a total weight of zero raises a
+    ValueError.
+    """
+    prob, alias, valid = table
+    if not valid[rows].all():
+        raise ValueError('Total of weights must be greater than zero')
+    point = rng.random(len(rows)) * prob.shape[1]
+    option = point.astype(np.int64)
+    keep = point - option < prob[rows, option]
+    return np.where(keep, option, alias[rows, option])
+
+
+def sample_batch(sampler, num, rng):
+    """Creates a batch of samples based on the HMM.
+
+    :param sampler: dictionary; the tables made by compile_sampler.
+    :param num: int; number of sequences to generate.
+    :param rng: numpy Generator; source of the random numbers.
+    :return: list; num sequences generated the same way as sample_HMM does.
+
+    All sequences take a step at the same time: the states, positions and
+    emissions of the sequences that did not reach the end are arrays. The
+    emissions of all steps are sorted per sequence at the end.
+    """
+    length = sampler['length']
+    state = np.zeros(num, dtype=np.int64)  # 0: M, 1: I, 2: D
+    pos = np.zeros(num, dtype=np.int64)
+    active = np.flatnonzero(pos != length)
+    seq_ids = []
+    letters = []
+    while len(active):
+        cur_state = state[active]
+        cur_pos = pos[active]
+        action = pick(sampler['trans'], cur_state * (length + 1) + cur_pos,
+                      rng)
+        emitted = np.full(len(active), ord('-'), dtype=np.uint8)
+        match = cur_state == 0
+        rows = cur_pos[match]
+        emitted[match] = sampler['match'][0][
+            rows, pick(sampler['match'][1:], rows, rng)]
+        insert = cur_state == 1
+        rows = np.zeros(insert.sum(), dtype=np.int64)
+        emitted[insert] = sampler['insert'][0][
+            rows, pick(sampler['insert'][1:], rows, rng)]
+        seq_ids.append(active)
+        letters.append(emitted)
+        state[active] = action
+        pos[active] = cur_pos + (action != 1)
+        active = active[pos[active] != length]
+    if not seq_ids:
+        return [''] * num
+    seq_ids = np.concatenate(seq_ids)
+    order = np.argsort(seq_ids, kind='stable')
+    text = np.concatenate(letters)[order].tobytes().decode()
+    ends = np.cumsum(np.bincount(seq_ids, minlength=num)).tolist()
+    return [text[start:end] for start, end in zip([0] + ends[:-1], ends)]
+
+
+def sample_sequences(norm_trans, norm_matches, num, seed=None,
+                     batch_size=100000):
+    """Generates many samples based on the HMM.
+
+    :param norm_trans: dictionary; the keys are the transition types. The
+                    values is a list of probabilities per position in a
+                    sequence
+    :param norm_matches: dictionary; the key is match state position in a
+                    sequence; the value is a list of lists with a sublist
+                    containing the probability of occurrence of the protein.
+    :param num: int; number of sequences to generate.
+    :param seed: int; seed for the random numbers, None gives a random seed.
+    :param batch_size: int; number of sequences generated at the same time.
+    :return: list; num generated sequences.
+    """
+    sampler = compile_sampler(norm_trans, norm_matches)
+    rng = np.random.default_rng(seed)
+    seqs = []
+    for start in range(0, num, batch_size):
+        seqs.extend(sample_batch(sampler, min(batch_size, num - start), rng))
+    return seqs
+
+
+def main(infile):
+    """This is the main function of the script
+
+    :param infile: list; every item is a sequence combined with a header
+    :return: tuple of two dictionaries; norm_trans and norm_matches.
+    """
+    fasta = parse_fasta(infile[1:])  # first is empty
+    alignment = load_alignment(list(fasta.values()))
+    return build_profile(alignment)
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    norm_trans, norm_matches = main(open(argv[1]).read().split('>'))
+    print("transition:", norm_trans)
+    print("emission:", norm_matches)
+    end_time = time.time()
+    print("time:", end_time - start_time)
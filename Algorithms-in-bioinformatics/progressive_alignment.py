@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+
+Description: this is a script to make a progressive multiple sequence
+alignment. The output can be used as input for Hidden_Markov_Model.py.
+
+Usage: python [script.py] [fasta file] [output file] [processes (optional)]
+
+The guide tree is built from k-mer distances with the average linkage
+clustering of clustering_engine.py. Along the tree profiles are
+aligned with the scoring and traceback of Globalalignment.py, where the score
+of two profile columns is the BLOSUM62 score weighted by the residue
+frequencies of both columns. Residues that are not in the BLOSUM62 matrix are
+written as 'X'.
+"""
+# import statements
+import time
+from multiprocessing import Pool
+from sys import argv
+
+import numpy as np
+
+from clustering_engine import cluster_points
+from Globalalignment import BLOSUM62, blosum_parser, traceback_matrix
+from Hidden_Markov_Model import parse_fasta
+
+DIRECTIONS = np.array(['dia', 'hor', 'ver'])
+
+
+def encode_sequences(seqs, order):
+    """Translates protein sequences to their index in the BLOSUM matrix.
+
+    :param seqs: list; protein sequences (without gaps).
+    :param order: dict of {res: idx_in_matrix}.
+    :return: list of numpy arrays; one uint8 array per sequence.
+    """
+    table = np.full(256, order['X'], dtype=np.uint8)
+    for res, idx in order.items():
+        table[ord(res)] = idx
+        table[ord(res.lower())] = idx
+    return [table[np.frombuffer(seq.encode(), dtype=np.uint8)]
+            for seq in seqs]
+
+
+def kmer_distances(encoded, alphabet, k=3):
+    """Calculates the k-mer distance between all pairs of sequences.
+
+    :param encoded: list of numpy arrays; sequences as BLOSUM indices.
+    :param alphabet: int; number of symbols in the BLOSUM matrix.
+    :param k: int; k-mer length.
+    :return: numpy array; square matrix with the distance between sequences.
+
+    The distance is one minus the fraction of shared k-mers, where the
+    fraction is taken over the sequence with the fewest distinct k-mers.
+    Every sequence keeps only its sorted distinct k-mer codes, so the memory
+    grows with the total sequence length and not with alphabet ** k per
+    sequence. The k-mers of one sequence are marked in a single table and
+    its shared k-mers with all earlier sequences are counted at once.
+    """
+    kmer_sets = []
+    for seq in encoded:
+        kmers = np.zeros(max(len(seq) - k + 1, 0), dtype=np.int64)
+        for i in range(k):
+            kmers = kmers * alphabet + seq[i:len(seq) - k + 1 + i]
+        kmer_sets.append(np.unique(kmers))
+    distinct = np.array([len(kmers) for kmers in kmer_sets], dtype=np.float32)
+    codes = np.concatenate([np.zeros(0, dtype=np.int64)] + kmer_sets)
+    owners = np.repeat(np.arange(len(encoded)), distinct.astype(np.int64))
+    marked = np.zeros(alphabet ** k, dtype=bool)
+    shared = np.zeros((len(encoded), len(encoded)), dtype=np.float32)
+    first = 0
+    for seq_id, kmers in enumerate(kmer_sets):
+        marked[kmers] = True
+        shared[seq_id, :seq_id] = np.bincount(
+            owners[:first], weights=marked[codes[:first]], minlength=seq_id)
+        marked[kmers] = False
+        first += len(kmers)
+    shared += shared.T
+    shared[np.diag_indices(len(encoded))] = distinct
+    smallest = np.maximum(np.minimum.outer(distinct, distinct), 1)
+    return 1 - shared / smallest
+
+
+def create_guide_tree(distances):
+    """Builds the guide tree with the agglomerative clustering.
+
+    :param distances: numpy array; square distance matrix.
+    :return: list of tuples; every tuple is a merge (node 1, node 2, new
+                node). The sequences are nodes 0 to n-1, every merge creates
+                the next node.
+
+    The tree is the average linkage clustering of clustering_engine.py
+    (nearest-neighbour chain), which takes O(n^2) time.
+    """
+    n = len(distances)
+    condensed = distances[np.tril_indices(n, -1)]
+    linkage = cluster_points(condensed, n, 'average')
+    return [(int(node1), int(node2), n + idx)
+            for idx, (node1, node2, dis, size) in enumerate(linkage)]
+
+
+def profile_frequencies(profile, alphabet):
+    """Calculates the residue frequencies per column of a profile.
+
+    :param profile: numpy array; rows are aligned sequences as BLOSUM indices,
+                the gap is index alphabet.
+    :param alphabet: int; number of symbols in the BLOSUM matrix.
+    :return: numpy array; columns x alphabet with the frequency of each
+                residue. Gaps are not counted, but do lower the frequencies.
+    """
+    freq = np.zeros((profile.shape[1], alphabet + 1))
+    columns = np.broadcast_to(np.arange(profile.shape[1]), profile.shape)
+    np.add.at(freq, (columns, profile), 1)
+    return freq[:, :alphabet] / profile.shape[0]
+
+
+def fill_profile_matrix(scores, gap_pen, end_gap_pen):
+    """Fills the alignment matrix of two profiles row by row.
+
+    :param scores: numpy array; score of every column pair of the profiles.
+    :param gap_pen: int; gap penalty.
+    :param end_gap_pen: int; end gap penalty.
+    :return: numpy array; traceback matrix with 'dia', 'hor' or 'ver'.
+
+    Same recursion and tie breaking as fil_matrix in Globalalignment.py. The
+    horizontal gaps of a row only depend on cells to the left, which makes
+    them a running maximum over the row so every row is one vector step.
+    """
+    rows, cols = scores.shape
+    steps = np.arange(cols + 1) * gap_pen
+    prev = np.arange(cols + 1) * float(end_gap_pen)
+    traceback = np.zeros((rows + 1, cols + 1), dtype=np.uint8)
+    traceback[0, 1:] = 1
+    traceback[1:, 0] = 2
+    for row_idx in range(1, rows + 1):
+        dia = prev[:-1] + scores[row_idx - 1]
+        ver = prev[1:] + gap_pen
+        best = np.empty(cols + 1)
+        best[0] = row_idx * end_gap_pen
+        best[1:] = np.maximum(dia, ver)
+        row = np.maximum.accumulate(best - steps) + steps
+        hor = row[:-1] + gap_pen
+        traceback[row_idx, 1:] = np.where(
+            (dia >= hor) & (dia >= ver), 0, np.where(hor >= ver, 1, 2))
+        prev = row
+    return DIRECTIONS[traceback]
+
+
+def align_profiles(profile1, profile2, blosum, gap_pen, end_gap_pen):
+    """Aligns two profiles and merges them into one.
+
+    :param profile1: numpy array; rows are aligned sequences as BLOSUM
+                indices, the gap is index len(blosum).
+    :param profile2: numpy array; same as profile1.
+    :param blosum: numpy array; BLOSUM similarity scores.
+    :param gap_pen: int; gap penalty.
+    :param end_gap_pen: int; end gap penalty.
+    :return: numpy array; the merged profile, rows of profile1 first.
+    """
+    alphabet = len(blosum)
+    scores = profile_frequencies(profile1, alphabet) @ blosum @ \
+        profile_frequencies(profile2, alphabet).T
+    traceback = fill_profile_matrix(scores, gap_pen, end_gap_pen)
+    cols1 = list(range(profile1.shape[1]))
+    cols2 = list(range(profile2.shape[1]))
+    align1, matches, align2 = traceback_matrix(
+        traceback, [len(cols1), len(cols2)], cols1, cols2)
+    merged = []
+    for profile, align in ((profile1, align1), (profile2, align2)):
+        gapped = np.hstack([profile, np.full((len(profile), 1), alphabet,
+                                             dtype=np.uint8)])
+        idx = [-1 if col == '-' else col for col in align]
+        merged.append(gapped[:, idx])
+    return np.vstack(merged)
+
+
+def align_merge(args):
+    """Unpacks the arguments for align_profiles (used by the process pool)"""
+    return align_profiles(*args)
+
+
+def progressive_alignment(seqs, processes=None, gap_pen=-5, end_gap_pen=-1):
+    """Aligns all sequences along the guide tree.
+
+    :param seqs: list; protein sequences (without gaps).
+    :param processes: int; number of processes, None uses all cores.
+    :param gap_pen: int; gap penalty.
+    :param end_gap_pen: int; end gap penalty.
+    :return: list; the aligned sequences in the same order as seqs (empty
+                without sequences).
+
+    Merges of which both children are aligned are independent, so every
+    level of the tree is aligned in parallel.
+    """
+    if not seqs:
+        return []
+    order, blosum = blosum_parser(BLOSUM62)
+    blosum = np.array(blosum, dtype=np.float64)
+    encoded = encode_sequences(seqs, order)
+    tree = create_guide_tree(kmer_distances(encoded, len(order)))
+    profiles = {idx: seq.reshape(1, -1) for idx, seq in enumerate(encoded)}
+    members = {idx: [idx] for idx in range(len(seqs))}
+    depth = {idx: 0 for idx in range(len(seqs))}
+    for node1, node2, new in tree:
+        depth[new] = max(depth[node1], depth[node2]) + 1
+    with Pool(processes) as pool:
+        for level in range(1, max(depth.values()) + 1):
+            merges = [merge for merge in tree if depth[merge[2]] == level]
+            jobs = [(profiles.pop(node1), profiles.pop(node2), blosum,
+                     gap_pen, end_gap_pen) for node1, node2, new in merges]
+            for (node1, node2, new), profile in zip(
+                    merges, pool.map(align_merge, jobs)):
+                profiles[new] = profile
+                members[new] = members.pop(node1) + members.pop(node2)
+    root = max(profiles)
+    letters = np.array([ord(res) for res in order] + [ord('-')],
+                       dtype=np.uint8)
+    aligned = [''] * len(seqs)
+    for seq_id, row in zip(members[root], profiles[root]):
+        aligned[seq_id] = letters[row].tobytes().decode()
+    return aligned
+
+
+def write_alignment(fasta, aligned, name):
+    """Writes the alignment as a FASTA file.
+
+    :param fasta: dictionary; the key is the sequence header; the value is
+                the sequence.
+    :param aligned: list; the aligned sequences in the same order as fasta.
+    :param name: str; name of the output file.
+    :return: None
+    """
+    with open(name, 'w') as file:
+        for header, seq in zip(fasta.keys(), aligned):
+            file.write('>' + header + '\n')
+            file.write(seq + '\n')
+
+
+def main():
+    """This is the main function of the script"""
+    infile = open(argv[1]).read().split('>')
+    fasta = parse_fasta(infile[1:])  # first is empty
+    processes = int(argv[3]) if len(argv) > 3 else None
+    aligned = progressive_alignment(list(fasta.values()), processes)
+    write_alignment(fasta, aligned, argv[2])
+
+
+if __name__ == "__main__":
+    start_time = time.time()
+    main()
+    end_time = time.time()
+    print("time:", end_time - start_time)
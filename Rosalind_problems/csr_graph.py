@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+Script to solve Rosalind challenge: Breadth-First Search, for large graphs
+
+The edge list is parsed once into compressed sparse row (CSR) arrays: the
+targets of all edges sorted on their source, and per node the offset of its
+first edge. The edges of node i are targets[offsets[i]:offsets[i + 1]].
+The breadth-first search expands a whole frontier (all nodes at the same
+distance) at once, so every edge is looked at once: O(V + E).
+
+The multi-source search runs up to 64 starting nodes at once. Every node
+has a 64-bit frontier and a 64-bit visited word with one bit per source, so
+one pass over the edges of the frontier moves all sources a level further.
+The distances of many sources are a sources x nodes matrix, which can be
+written to a .npy file block by block.
+
+Usage: python [script.py] [edge list file or binary edge file (edge_file.py)]
+       [start node (optional, default 1)]
+"""
+
+# import statements
+from sys import argv
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from edge_file import is_edge_file, load_edge_file
+
+WORD = 64  # number of sources in one multi-source search
+
+
+def read_edge_list(name):
+    """Reads an edge list file
+
+    :param name: str; name of the file. The first line is the number of
+            nodes and the number of edges, every next line one edge
+            'source target' with the nodes labeled from 1 to n.
+    :return:
+        nodes: int; the number of nodes
+        sources: numpy array; source of every edge (labeled from 0)
+        targets: numpy array; target of every edge (labeled from 0)
+    """
+    with open(name, 'rb') as file:
+        numbers = np.array(file.read().split(), dtype=np.int64)
+    nodes = int(numbers[0])
+    edges = numbers[2:2 + 2 * int(numbers[1])].reshape(-1, 2) - 1
+    return nodes, edges[:, 0], edges[:, 1]
+
+
+def build_csr(nodes, sources, targets, directed=True, weights=None):
+    """Builds the compressed sparse row arrays of a graph
+
+    :param nodes: int; the number of nodes
+    :param sources: numpy array; source of every edge (labeled from 0)
+    :param targets: numpy array; target of every edge (labeled from 0)
+    :param directed: bool; False adds every edge in both directions
+    :param weights: numpy array; weight of every edge, None for an
+        unweighted graph. The type of the array is kept.
+    :return: dict; 'offsets': first edge of every node (nodes + 1 long),
+        'targets': the targets sorted on source, and 'weights' in the same
+        order when weights are given
+    """
+    if not directed:
+        sources, targets = (np.concatenate([sources, targets]),
+                            np.concatenate([targets, sources]))
+        if weights is not None:
+            weights = np.concatenate([weights, weights])
+    order = np.argsort(sources, kind='stable')
+    offsets = np.zeros(nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=nodes), out=offsets[1:])
+    graph = {'offsets': offsets,
+             'targets': np.asarray(targets[order], dtype=np.int64)}
+    if weights is not None:
+        graph['weights'] = np.asarray(weights)[order]
+    return graph
+
+
+def load_graph(name, directed=True):
+    """Reads a graph from an edge list file or a binary edge file
+
+    :param name: str; name of the file
+    :param directed: bool; False adds every edge in both directions
+    :return: dict; the CSR arrays like build_csr makes. A binary edge file
+        with CSR offsets is used as it is (memory mapped, no copy).
+    """
+    if not is_edge_file(name):
+        return build_csr(*read_edge_list(name), directed)
+    edges = load_edge_file(name)
+    if directed and edges['offsets'] is not None:
+        return {'offsets': edges['offsets'], 'targets': edges['targets']}
+    return build_csr(edges['nodes'], edges['sources'], edges['targets'],
+                     directed)
+
+
+def edge_positions(offsets, frontier):
+    """Gives the positions of all edges out of a set of nodes
+
+    :param offsets: numpy array; the CSR offsets
+    :param frontier: numpy array; the nodes
+    :return: numpy array; index in the CSR targets of every edge out of the
+        nodes, the edges of one node after each other
+    """
+    starts = offsets[frontier]
+    counts = offsets[frontier + 1] - starts
+    # start of every edge's node repeated, plus the place within the node
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + \
+        np.arange(counts.sum())
+
+
+def bfs(graph, start):
+    """Calculates the distance of all nodes from a starting node
+
+    :param graph: dict; the CSR arrays made by build_csr
+    :param start: int; the starting node (labeled from 0)
+    :return: numpy array; the number of edges from start to every node
+        (-1 represents no path)
+    """
+    offsets, targets = graph['offsets'], graph['targets']
+    distance = np.full(len(offsets) - 1, -1, dtype=np.int64)
+    distance[start] = 0
+    frontier = np.array([start])
+    level = 0
+    while len(frontier):
+        level += 1
+        reached = targets[edge_positions(offsets, frontier)]
+        frontier = np.unique(reached[distance[reached] == -1])
+        distance[frontier] = level
+    return distance
+
+
+def bitset_bfs(graph, sources):
+    """Calculates the distances from up to 64 starting nodes at once
+
+    :param graph: dict; the CSR arrays made by build_csr
+    :param sources: list; the starting nodes (labeled from 0), at most 64
+    :return: numpy array; sources x nodes number of edges from every start
+        (-1 represents no path)
+
+    Bit i of the words of a node belongs to source i. The frontier words of
+    the edges are or-ed into their targets, the bits that were already
+    visited are removed and what is left is the next frontier.
+    """
+    offsets, targets = graph['offsets'], graph['targets']
+    nodes = len(offsets) - 1
+    if len(sources) > WORD:
+        raise ValueError("at most {} sources at once".format(WORD))
+    distance = np.full((len(sources), nodes), -1, dtype=np.int32)
+    bits = np.uint64(1) << np.arange(len(sources), dtype=np.uint64)
+    frontier = np.zeros(nodes, dtype=np.uint64)
+    np.bitwise_or.at(frontier, sources, bits)
+    visited = frontier.copy()
+    distance[np.arange(len(sources)), sources] = 0
+    level = 0
+    active = np.flatnonzero(frontier)
+    while len(active):
+        level += 1
+        counts = offsets[active + 1] - offsets[active]
+        reached = np.zeros(nodes, dtype=np.uint64)
+        np.bitwise_or.at(reached, targets[edge_positions(offsets, active)],
+                         np.repeat(frontier[active], counts))
+        reached &= ~visited
+        visited |= reached
+        active = np.flatnonzero(reached)
+        frontier = reached
+        words = frontier[active]
+        for row, bit in enumerate(bits):
+            distance[row, active[(words & bit) != 0]] = level
+    return distance
+
+
+def multi_source_bfs(graph, sources, name=None):
+    """Calculates the distances from many starting nodes
+
+    :param graph: dict; the CSR arrays made by build_csr
+    :param sources: list; the starting nodes (labeled from 0)
+    :param name: str; name of a .npy file to write the distances to, None
+        keeps them in memory
+    :return: numpy array; sources x nodes number of edges from every start
+        (-1 represents no path), a memory map of the file when name is
+        given
+
+    The sources are searched in groups of 64 with bitset_bfs; with a file
+    every group is written as soon as it is done.
+    """
+    nodes = len(graph['offsets']) - 1
+    shape = (len(sources), nodes)
+    if name is None:
+        distance = np.empty(shape, dtype=np.int32)
+    else:
+        distance = open_memmap(name, mode='w+', dtype=np.int32, shape=shape)
+    for start in range(0, len(sources), WORD):
+        group = list(sources[start:start + WORD])
+        distance[start:start + len(group)] = bitset_bfs(graph, group)
+    if name is not None:
+        distance.flush()
+    return distance
+
+
+def writing_txt_file(distance):
+    """Writing an output file
+
+    distance: numpy array; the distance of every node
+    return: None
+    """
+    with open('result.txt', 'w') as file:
+        file.write(' '.join(map(str, distance.tolist())) + ' ')
+
+
+def main():
+    """this is the main function of the script"""
+    start = int(argv[2]) if len(argv) > 2 else 1
+    graph = load_graph(argv[1])
+    distance = bfs(graph, start - 1)
+    writing_txt_file(distance)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+Script to solve Rosalind challenge: Dijkstra's Algorithm, for large weighted
+graphs
+
+The graph is stored in the CSR arrays of csr_graph.py with a weight array of
+its own type (integer weights stay integers). The nodes are taken from a
+binary heap in order of distance. A node can be in the heap more than once:
+an entry with a larger distance than the best one found is skipped when it
+comes out (lazy deletion), so no entry has to be moved in the heap. With a
+target the search stops as soon as the target comes out of the heap.
+
+The bidirectional search runs one search forward from the start and one
+backward (on the reversed edges) from the target, always taking the side with
+the smallest distance in its heap. It stops when the two smallest distances
+together are at least the shortest path found through a node both searches
+reached, so both searches only cover about the nodes closer than half the
+path length.
+
+Usage: python [script.py] [weighted edge list file]
+       [start node (optional, default 1)] [target node (optional)]
+"""
+
+# import statements
+import heapq
+from math import inf
+from sys import argv
+
+import numpy as np
+
+from csr_graph import build_csr
+
+
+def read_weighted_edge_list(name, dtype=np.int64):
+    """Reads a weighted edge list file
+
+    :param name: str; name of the file. The first line is the number of
+            nodes and the number of edges, every next line one edge
+            'source target weight' with the nodes labeled from 1 to n.
+    :param dtype: numpy type; the type of the weights
+    :return:
+        nodes: int; the number of nodes
+        sources: numpy array; source of every edge (labeled from 0)
+        targets: numpy array; target of every edge (labeled from 0)
+        weights: numpy array; weight of every edge
+    """
+    with open(name, 'rb') as file:
+        fields = np.array(file.read().split())
+    nodes, edges = int(fields[0]), int(fields[1])
+    table = fields[2:2 + 3 * edges].reshape(-1, 3)
+    ends = table[:, :2].astype(np.int64) - 1
+    return nodes, ends[:, 0], ends[:, 1], table[:, 2].astype(dtype)
+
+
+def reverse_graph(graph):
+    """Builds the CSR arrays of the graph with every edge turned around
+
+    :param graph: dict; the CSR arrays made by build_csr, with weights
+    :return: dict; the CSR arrays of the reversed graph
+    """
+    offsets = graph['offsets']
+    nodes = len(offsets) - 1
+    sources = np.repeat(np.arange(nodes), np.diff(offsets))
+    return build_csr(nodes, graph['targets'], sources,
+                     weights=graph['weights'])
+
+
+def check_weights(graph):
+    """Checks that the search can be used on the graph
+
+    :param graph: dict; the CSR arrays made by build_csr
+    :return: None; raises ValueError without weights or with a negative
+        weight
+    """
+    if 'weights' not in graph:
+        raise ValueError("the graph has no weights")
+    if len(graph['weights']) and graph['weights'].min() < 0:
+        raise ValueError("Dijkstra's algorithm needs weights of 0 or more")
+
+
+def dijkstra(graph, start, target=None):
+    """Calculates the shortest distances from a starting node
+
+    :param graph: dict; the CSR arrays made by build_csr, with weights
+    :param start: int; the starting node (labeled from 0)
+    :param target: int; stop when this node is reached (labeled from 0),
+        None searches the whole graph
+    :return:
+        distance: numpy array; the shortest distance from start to every
+            node, in the type of the weights (-1 represents no path, or
+            with a target: not reached before the target)
+        parent: dict; the previous node on the shortest path of every
+            reached node (None for start)
+    """
+    check_weights(graph)
+    offsets, targets = graph['offsets'], graph['targets']
+    weights = graph['weights']
+    best = {start: 0}
+    parent = {start: None}
+    done = {}
+    heap = [(0, start)]
+    while heap:
+        dis, node = heapq.heappop(heap)
+        if dis > best[node]:
+            continue  # an old entry, the node was reached shorter since
+        done[node] = dis
+        if node == target:
+            break
+        first, last = offsets[node], offsets[node + 1]
+        for nxt, weight in zip(targets[first:last].tolist(),
+                               weights[first:last].tolist()):
+            new = dis + weight
+            if new < best.get(nxt, inf):
+                best[nxt] = new
+                parent[nxt] = node
+                heapq.heappush(heap, (new, nxt))
+    distance = np.full(len(offsets) - 1, -1, dtype=weights.dtype)
+    if done:
+        distance[list(done)] = list(done.values())
+    return distance, parent
+
+
+def path_to(parent, node):
+    """Follows the parents back to the start
+
+    :param parent: dict; the previous node of every reached node
+    :param node: int; the last node of the path
+    :return: list; the nodes from the start to node
+    """
+    path = []
+    while node is not None:
+        path.append(node)
+        node = parent[node]
+    return path[::-1]
+
+
+def bidirectional_dijkstra(graph, reverse, start, target):
+    """Calculates the shortest path between two nodes from both ends
+
+    :param graph: dict; the CSR arrays made by build_csr, with weights
+    :param reverse: dict; the CSR arrays made by reverse_graph
+    :param start: int; the starting node (labeled from 0)
+    :param target: int; the target node (labeled from 0)
+    :return:
+        length: number; the length of the shortest path (-1 represents no
+            path)
+        path: list; the nodes of the shortest path (empty without path)
+    """
+    check_weights(graph)
+    graphs = [graph, reverse]
+    best = [{start: 0}, {target: 0}]
+    parent = [{start: None}, {target: None}]
+    heaps = [[(0, start)], [(0, target)]]
+    length, meet = (0, start) if start == target else (inf, None)
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= length:
+            break
+        side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+        dis, node = heapq.heappop(heaps[side])
+        if dis > best[side][node]:
+            continue
+        offsets, targets = graphs[side]['offsets'], graphs[side]['targets']
+        first, last = offsets[node], offsets[node + 1]
+        for nxt, weight in zip(targets[first:last].tolist(),
+                               graphs[side]['weights'][first:last].tolist()):
+            new = dis + weight
+            if new < best[side].get(nxt, inf):
+                best[side][nxt] = new
+                parent[side][nxt] = node
+                heapq.heappush(heaps[side], (new, nxt))
+                through = new + best[1 - side].get(nxt, inf)
+                if through < length:
+                    length, meet = through, nxt
+    if meet is None:
+        return -1, []
+    # the backward parents point towards the target
+    return length, path_to(parent[0], meet) + \
+        path_to(parent[1], meet)[::-1][1:]
+
+
+def writing_txt_file(distance):
+    """Writing an output file
+
+    distance: numpy array; the distance of every node
+    return: None
+    """
+    with open('result.txt', 'w') as file:
+        file.write(' '.join(map(str, distance.tolist())))
+
+
+def main():
+    """this is the main function of the script"""
+    start = int(argv[2]) - 1 if len(argv) > 2 else 0
+    nodes, sources, targets, weights = read_weighted_edge_list(argv[1])
+    graph = build_csr(nodes, sources, targets, weights=weights)
+    if len(argv) > 3:
+        length, path = bidirectional_dijkstra(graph, reverse_graph(graph),
+                                              start, int(argv[3]) - 1)
+        print(length)
+        print(' '.join(str(node + 1) for node in path))
+    else:
+        distance, parent = dijkstra(graph, start)
+        writing_txt_file(distance)
+
+
+if __name__ == "__main__":
+    main()
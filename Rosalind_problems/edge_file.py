@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+Script to convert an edge list (the Rosalind graph format) into a binary
+file that the graph scripts can map into memory
+
+The file starts with a header (magic, version, number of nodes, number of
+edges and flags), followed without padding by:
+    sources     int32, source of every edge (labeled from 0)
+    targets     int32, target of every edge (labeled from 0)
+    offsets     int64, nodes + 1 CSR offsets, only when the CSR flag is set;
+                the edges are then sorted on their source, so targets is
+                the CSR target array of csr_graph.py
+Loading maps the file into memory: nothing is parsed or copied, and
+processes that load the same file share its pages.
+
+Usage: python [script.py] [edge list file] [binary file]
+       [with CSR offsets: yes or no (optional, default yes)]
+"""
+
+# import statements
+import struct
+from sys import argv
+
+import numpy as np
+
+MAGIC = b'EDGE'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQQ')  # magic, version, nodes, edges, flags
+CSR = 1  # flag: the edges are sorted on source and the offsets are stored
+
+
+def text_edge_chunks(name, chunk_size=2 ** 22):
+    """Reads the edges of an edge list file in chunks
+
+    :param name: str; name of the edge list file (first line: the number
+            of nodes and edges, then one edge 'a b' per line, nodes labeled
+            from 1 to n)
+    :param chunk_size: int; about the number of bytes read at once
+    :return: generator; numpy arrays of sources and targets (labeled from 0)
+    """
+    with open(name, 'rb') as file:
+        file.readline()
+        while True:
+            lines = file.readlines(chunk_size)
+            if not lines:
+                return
+            edges = np.array(b''.join(lines).split(), dtype=np.int64) - 1
+            yield edges[0::2], edges[1::2]
+
+
+def is_edge_file(name):
+    """Tells whether a file is a binary edge file
+
+    :param name: str; name of the file
+    :return: bool; True when the file starts with MAGIC
+    """
+    with open(name, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def convert_edge_list(text_name, name, csr=True, chunk_size=2 ** 22):
+    """Converts an edge list file into a binary edge file
+
+    :param text_name: str; name of the edge list file
+    :param name: str; name of the binary file
+    :param csr: bool; sort the edges on source and store the CSR offsets
+    :param chunk_size: int; about the number of bytes read at once
+    :return: None
+
+    The edges are written into the mapped file chunk by chunk, so the text
+    is never held in memory as a whole. Sorting for the CSR offsets needs
+    the edges in memory once.
+    """
+    with open(text_name, 'rb') as file:
+        nodes, edges = [int(x) for x in file.readline().split()[:2]]
+    if nodes >= 2 ** 31:
+        raise ValueError("too many nodes for int32 labels")
+    size = HEADER.size + 8 * edges + (8 * (nodes + 1) if csr else 0)
+    with open(name, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, nodes, edges,
+                               CSR if csr else 0))
+        file.truncate(size)
+    raw = np.memmap(name, dtype=np.uint8, mode='r+')
+    sources = raw[HEADER.size:HEADER.size + 4 * edges].view(np.int32)
+    targets = raw[HEADER.size + 4 * edges:HEADER.size + 8 * edges].view(
+        np.int32)
+    done = 0
+    for chunk_sources, chunk_targets in text_edge_chunks(text_name,
+                                                         chunk_size):
+        end = done + len(chunk_sources)
+        if end > edges or len(chunk_targets) != len(chunk_sources):
+            raise ValueError("{} does not have {} edges".format(text_name,
+                                                                 edges))
+        if len(chunk_sources) and (
+                min(chunk_sources.min(), chunk_targets.min()) < 0 or
+                max(chunk_sources.max(), chunk_targets.max()) >= nodes):
+            raise ValueError("node label outside 1 to {}".format(nodes))
+        sources[done:end] = chunk_sources
+        targets[done:end] = chunk_targets
+        done = end
+    if done != edges:
+        raise ValueError("{} does not have {} edges".format(text_name, edges))
+    if csr:
+        order = np.argsort(sources, kind='stable')
+        sources[:] = sources[order]
+        targets[:] = targets[order]
+        offsets = raw[HEADER.size + 8 * edges:].view(np.int64)
+        offsets[0] = 0
+        np.cumsum(np.bincount(sources, minlength=nodes), out=offsets[1:])
+    raw.flush()
+
+
+def load_edge_file(name):
+    """Maps a binary edge file into memory
+
+    :param name: str; name of the binary file
+    :return: dict; 'nodes' and 'edges' (int), the read-only arrays
+        'sources' and 'targets', and 'offsets' (None without CSR)
+    """
+    raw = np.memmap(name, dtype=np.uint8, mode='r')
+    if len(raw) < HEADER.size:
+        raise ValueError("{} is not an edge file".format(name))
+    magic, version, nodes, edges, flags = HEADER.unpack(
+        raw[:HEADER.size].tobytes())
+    if magic != MAGIC:
+        raise ValueError("{} is not an edge file".format(name))
+    if version != VERSION:
+        raise ValueError("unsupported edge file version {}".format(version))
+    size = HEADER.size + 8 * edges + (8 * (nodes + 1) if flags & CSR else 0)
+    if len(raw) != size:
+        raise ValueError("{} is truncated or too long".format(name))
+    start = HEADER.size
+    graph = {'nodes': nodes, 'edges': edges,
+             'sources': raw[start:start + 4 * edges].view(np.int32),
+             'targets': raw[start + 4 * edges:start + 8 * edges].view(
+                 np.int32),
+             'offsets': None}
+    if flags & CSR:
+        graph['offsets'] = raw[start + 8 * edges:].view(np.int64)
+    return graph
+
+
+def open_edges(name, chunk_size=2 ** 22):
+    """Opens an edge list file or a binary edge file for streaming
+
+    :param name: str; name of the file
+    :param chunk_size: int; about the number of bytes per chunk
+    :return:
+        nodes: int; the number of nodes
+        chunks: generator; numpy arrays of sources and targets (labeled
+            from 0)
+    """
+    if not is_edge_file(name):
+        with open(name, 'rb') as file:
+            nodes = int(file.readline().split()[0])
+        return nodes, text_edge_chunks(name, chunk_size)
+    graph = load_edge_file(name)
+    step = max(1, chunk_size // 8)
+    chunks = ((graph['sources'][start:start + step],
+               graph['targets'][start:start + step])
+              for start in range(0, graph['edges'], step))
+    return graph['nodes'], chunks
+
+
+def main():
+    """this is the main function of the script"""
+    csr = argv[3].lower() != 'no' if len(argv) > 3 else True
+    convert_edge_list(argv[1], argv[2], csr)
+    graph = load_edge_file(argv[2])
+    print("{} nodes, {} edges".format(graph['nodes'], graph['edges']))
+
+
+if __name__ == "__main__":
+    main()
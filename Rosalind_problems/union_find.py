@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Author: Joyce van der Sel
+Script to solve Rosalind challenge: Connected Components, for large graphs
+
+The edges are read from the file in chunks and joined in a disjoint-set
+forest: every node points to a parent and the root of a tree stands for a
+component. A chunk of edges is joined with a few NumPy steps instead of a
+Python loop over the edges: the roots of both ends are found for all edges
+at once, every root hooks under the lowest root it has an edge to
+(np.minimum.at) and pointer jumping (parent[parent]) points the hooked roots
+straight to their new root again. This repeats until both ends of every edge
+of the chunk have the same root. Parents only point to lower nodes, so no
+cycles are made. Only the parent of every node is kept, no lists of
+neighbours.
+
+Usage: python [script.py] [edge list file or binary edge file (edge_file.py)]
+       [labels output file (optional)]
+"""
+
+# import statements
+from sys import argv
+
+import numpy as np
+
+from edge_file import open_edges
+
+
+def find_roots(parent, nodes):
+    """Finds the roots of nodes and compresses the paths to them
+
+    :param parent: numpy array; the parent of every node, changed in place
+    :param nodes: numpy array; the nodes
+    :return: numpy array; the root of every node
+    """
+    path = [nodes]
+    roots = parent[nodes]
+    while True:
+        up = parent[roots]
+        if np.array_equal(up, roots):
+            break
+        path.append(roots)
+        roots = up
+    for level in path:
+        parent[level] = roots
+    return roots
+
+
+def jump_pointers(parent, nodes):
+    """Points nodes straight to their root by pointer jumping
+
+    :param parent: numpy array; the parent of every node, changed in place
+    :param nodes: numpy array; the nodes
+    :return: None
+    """
+    while True:
+        up = parent[parent[nodes]]
+        if np.array_equal(up, parent[nodes]):
+            return
+        parent[nodes] = up
+
+
+def add_edges(parent, sources, targets):
+    """Joins the components of the ends of every edge
+
+    :param parent: numpy array; the parent of every node, changed in place
+    :param sources: numpy array; source of every edge (labeled from 0)
+    :param targets: numpy array; target of every edge (labeled from 0)
+    :return: int; the number of unions made (components that disappeared)
+    """
+    unions = 0
+    while len(sources):
+        roots_a = find_roots(parent, sources)
+        roots_b = find_roots(parent, targets)
+        apart = roots_a != roots_b
+        sources = np.minimum(roots_a[apart], roots_b[apart])
+        targets = np.maximum(roots_a[apart], roots_b[apart])
+        # every root hooks under the lowest root it has an edge to
+        np.minimum.at(parent, targets, sources)
+        hooked = np.sort(targets)
+        hooked = hooked[np.diff(hooked, prepend=-1) != 0]
+        unions += len(hooked)
+        jump_pointers(parent, hooked)
+    return unions
+
+
+def connected_components(name, labels=False, chunk_size=2 ** 22):
+    """Finds the connected components of the graph in an edge list file
+
+    :param name: str; name of the edge list file (first line: the number
+            of nodes and edges, then one edge 'a b' per line, nodes labeled
+            from 1 to n) or of a binary edge file (edge_file.py)
+    :param labels: bool; also give the component of every node
+    :param chunk_size: int; about the number of bytes read at once
+    :return:
+        count: int; the number of components
+        sizes: numpy array; the number of nodes in every component
+        node_labels: numpy array; the component of every node, numbered in
+            the order of their first node (None when labels is False)
+    """
+    nodes, chunks = open_edges(name, chunk_size)
+    parent = np.arange(nodes)
+    count = nodes
+    for sources, targets in chunks:
+        count -= add_edges(parent, sources, targets)
+    jump_pointers(parent, np.arange(nodes))
+    roots = parent
+    unique, first, sizes = np.unique(roots, return_index=True,
+                                     return_counts=True)
+    order = np.argsort(first, kind='stable')
+    node_labels = None
+    if labels:
+        number = np.empty(len(unique), dtype=np.int64)
+        number[order] = np.arange(len(unique))
+        node_labels = number[np.searchsorted(unique, roots)]
+    return count, sizes[order], node_labels
+
+
+def main():
+    """this is the main function of the script"""
+    count, sizes, node_labels = connected_components(argv[1],
+                                                     len(argv) > 2)
+    print(count)
+    if len(argv) > 2:
+        with open(argv[2], 'w') as file:
+            for node, label in enumerate(node_labels.tolist(), 1):
+                file.write('{} {}\n'.format(node, label + 1))
+
+
+if __name__ == "__main__":
+    main()